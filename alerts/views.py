@@ -2,27 +2,21 @@
 Alerts views for ScreenGuard Pro.
 """
 
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.views.decorators.cache import cache_page
+from django.views.decorators.vary import vary_on_cookie
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import status
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
-
-def alert_list(request):
-    """Alert list view."""
-    return render(request, 'alerts/list.html')
-
-
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def alert_list_api(request):
-    """API endpoint for alert list."""
-    # Mock data for demonstration
-    alerts = [
+# Mock payloads are static, so serialize them once at import time
+_ALERT_LIST_JSON = orjson.dumps({
+    'alerts': [
         {
             'id': 1,
             'type': 'visual',
@@ -44,8 +38,40 @@ def alert_list_api(request):
             'is_read': True
         }
     ]
-    
-    return Response({'alerts': alerts})
+})
+
+_ALERT_SETTINGS_JSON = orjson.dumps({
+    'visual_alerts': {
+        'enabled': True,
+        'threshold': 0.7,
+        'cooldown': 3
+    },
+    'audio_alerts': {
+        'enabled': True,
+        'threshold': 0.8,
+        'cooldown': 5
+    },
+    'haptic_alerts': {
+        'enabled': True,
+        'threshold': 0.6,
+        'cooldown': 2
+    }
+})
+
+
+# The page renders the signed-in user, so cache one copy per session cookie
+@cache_page(60 * 60)
+@vary_on_cookie
+def alert_list(request):
+    """Alert list view."""
+    return render(request, 'alerts/list.html')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def alert_list_api(request):
+    """API endpoint for alert list."""
+    return HttpResponse(_ALERT_LIST_JSON, content_type='application/json')
 
 
 @api_view(['GET', 'PUT'])
@@ -53,24 +79,7 @@ def alert_list_api(request):
 def alert_settings_api(request):
     """API endpoint for alert settings."""
     if request.method == 'GET':
-        settings = {
-            'visual_alerts': {
-                'enabled': True,
-                'threshold': 0.7,
-                'cooldown': 3
-            },
-            'audio_alerts': {
-                'enabled': True,
-                'threshold': 0.8,
-                'cooldown': 5
-            },
-            'haptic_alerts': {
-                'enabled': True,
-                'threshold': 0.6,
-                'cooldown': 2
-            }
-        }
-        return Response(settings)
+        return HttpResponse(_ALERT_SETTINGS_JSON, content_type='application/json')
     
     elif request.method == 'PUT':
         # Update alert settings
@@ -2,16 +2,90 @@
 Analytics views for ScreenGuard Pro.
 """
 
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
+from django.views.decorators.cache import cache_page
+from django.views.decorators.vary import vary_on_cookie
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from datetime import timedelta
+import csv
 import logging
+import orjson
+
+from dashboard.models import ActivityLog
 
 logger = logging.getLogger(__name__)
 
+# Columns written by export_data_api
+EXPORT_FIELDS = ('timestamp', 'action', 'description', 'ip_address')
+EXPORT_CHUNK_SIZE = 1000
+# Accepted export date ranges and the number of days each covers
+EXPORT_DATE_RANGES = {'7d': 7, '30d': 30, '90d': 90}
+
+_OVERVIEW_JSON = orjson.dumps({
+    'total_detections': 156,
+    'peeking_detections': 23,
+    'false_positives': 2,
+    'accuracy_rate': 0.91,
+    'average_confidence': 0.89,
+    'detection_trends': [
+        {'date': '2024-01-15', 'count': 12},
+        {'date': '2024-01-14', 'count': 8},
+        {'date': '2024-01-13', 'count': 15},
+    ],
+    'device_usage': [
+        {'device': 'iPhone 13', 'detections': 45, 'percentage': 28.8},
+        {'device': 'MacBook Pro', 'detections': 67, 'percentage': 42.9},
+        {'device': 'iPad Air', 'detections': 44, 'percentage': 28.2},
+    ]
+})
+
+_DETECTION_ANALYTICS_JSON = orjson.dumps({
+    'hourly_distribution': [
+        {'hour': 9, 'detections': 5},
+        {'hour': 10, 'detections': 8},
+        {'hour': 11, 'detections': 12},
+        {'hour': 14, 'detections': 15},
+        {'hour': 15, 'detections': 18},
+    ],
+    'confidence_distribution': [
+        {'range': '0.9-1.0', 'count': 45},
+        {'range': '0.8-0.9', 'count': 67},
+        {'range': '0.7-0.8', 'count': 32},
+        {'range': '0.6-0.7', 'count': 12},
+    ],
+    'accuracy_over_time': [
+        {'date': '2024-01-15', 'accuracy': 0.91},
+        {'date': '2024-01-14', 'accuracy': 0.89},
+        {'date': '2024-01-13', 'accuracy': 0.93},
+    ]
+})
+
+_ALERT_ANALYTICS_JSON = orjson.dumps({
+    'alert_types': [
+        {'type': 'Visual', 'count': 45, 'percentage': 35.7},
+        {'type': 'Audio', 'count': 32, 'percentage': 25.4},
+        {'type': 'Haptic', 'count': 49, 'percentage': 38.9},
+    ],
+    'alert_trends': [
+        {'date': '2024-01-15', 'count': 12},
+        {'date': '2024-01-14', 'count': 8},
+        {'date': '2024-01-13', 'count': 15},
+    ],
+    'response_times': {
+        'average': 0.25,
+        'min': 0.12,
+        'max': 0.45
+    }
+})
+
 
+@cache_page(60 * 60)
+@vary_on_cookie
 def analytics_dashboard(request):
     """Analytics dashboard view."""
     return render(request, 'analytics/dashboard.html')
@@ -21,78 +95,42 @@ def analytics_dashboard(request):
 @permission_classes([IsAuthenticated])
 def analytics_overview_api(request):
     """API endpoint for analytics overview."""
-    overview = {
-        'total_detections': 156,
-        'peeking_detections': 23,
-        'false_positives': 2,
-        'accuracy_rate': 0.91,
-        'average_confidence': 0.89,
-        'detection_trends': [
-            {'date': '2024-01-15', 'count': 12},
-            {'date': '2024-01-14', 'count': 8},
-            {'date': '2024-01-13', 'count': 15},
-        ],
-        'device_usage': [
-            {'device': 'iPhone 13', 'detections': 45, 'percentage': 28.8},
-            {'device': 'MacBook Pro', 'detections': 67, 'percentage': 42.9},
-            {'device': 'iPad Air', 'detections': 44, 'percentage': 28.2},
-        ]
-    }
-    
-    return Response(overview)
+    return HttpResponse(_OVERVIEW_JSON, content_type='application/json')
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def detection_analytics_api(request):
     """API endpoint for detection analytics."""
-    analytics = {
-        'hourly_distribution': [
-            {'hour': 9, 'detections': 5},
-            {'hour': 10, 'detections': 8},
-            {'hour': 11, 'detections': 12},
-            {'hour': 14, 'detections': 15},
-            {'hour': 15, 'detections': 18},
-        ],
-        'confidence_distribution': [
-            {'range': '0.9-1.0', 'count': 45},
-            {'range': '0.8-0.9', 'count': 67},
-            {'range': '0.7-0.8', 'count': 32},
-            {'range': '0.6-0.7', 'count': 12},
-        ],
-        'accuracy_over_time': [
-            {'date': '2024-01-15', 'accuracy': 0.91},
-            {'date': '2024-01-14', 'accuracy': 0.89},
-            {'date': '2024-01-13', 'accuracy': 0.93},
-        ]
-    }
-    
-    return Response(analytics)
+    return HttpResponse(_DETECTION_ANALYTICS_JSON, content_type='application/json')
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def alert_analytics_api(request):
     """API endpoint for alert analytics."""
-    analytics = {
-        'alert_types': [
-            {'type': 'Visual', 'count': 45, 'percentage': 35.7},
-            {'type': 'Audio', 'count': 32, 'percentage': 25.4},
-            {'type': 'Haptic', 'count': 49, 'percentage': 38.9},
-        ],
-        'alert_trends': [
-            {'date': '2024-01-15', 'count': 12},
-            {'date': '2024-01-14', 'count': 8},
-            {'date': '2024-01-13', 'count': 15},
-        ],
-        'response_times': {
-            'average': 0.25,
-            'min': 0.12,
-            'max': 0.45
-        }
-    }
+    return HttpResponse(_ALERT_ANALYTICS_JSON, content_type='application/json')
+
+
+class _Echo:
+    """File-like object that returns written rows so csv.writer can stream."""
     
-    return Response(analytics)
+    def write(self, value):
+        return value
+
+
+def _csv_export_rows(rows):
+    """Yield CSV lines for the export, header first."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _json_export_rows(rows):
+    """Yield newline-delimited JSON objects for the export."""
+    for row in rows:
+        yield orjson.dumps(dict(zip(EXPORT_FIELDS, row))) + b'\n'
 
 
 @api_view(['POST'])
@@ -102,9 +140,29 @@ def export_data_api(request):
     export_format = request.data.get('format', 'csv')
     date_range = request.data.get('date_range', '30d')
     
-    # Mock export response
-    return Response({
-        'message': f'Data exported successfully in {export_format} format',
-        'download_url': f'/api/analytics/download/export_{export_format}_{date_range}.{export_format}',
-        'file_size': '2.3 MB'
-    })
+    if export_format not in ('csv', 'json'):
+        return Response(
+            {'error': f'Unsupported export format: {export_format}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    days = EXPORT_DATE_RANGES.get(str(date_range))
+    if days is None:
+        return Response(
+            {'error': f'Invalid date range: {date_range}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Stream rows straight from the database cursor without building model instances
+    rows = ActivityLog.objects.filter(
+        user=request.user,
+        timestamp__gte=timezone.now() - timedelta(days=days)
+    ).values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    
+    if export_format == 'csv':
+        response = StreamingHttpResponse(_csv_export_rows(rows), content_type='text/csv')
+    else:
+        response = StreamingHttpResponse(_json_export_rows(rows), content_type='application/x-ndjson')
+    
+    response['Content-Disposition'] = f'attachment; filename="export_{export_format}_{date_range}.{export_format}"'
+    return response
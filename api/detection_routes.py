@@ -4,14 +4,18 @@ Handles detection-related API endpoints for the ScreenGuard Pro application.
 """
 
 from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import List, Optional, Dict, Any, Tuple
+from collections import OrderedDict
 import asyncio
+import binascii
+import dataclasses
 import logging
 import time
-import json
+import orjson
+import pybase64
 
-from ..models.screen_peek_detector import ScreenPeekDetector, DetectionResult
+from ..models.screen_peek_detector import DetectionResult, get_detector
 from ..services.alert_service import AlertService, AlertType, AlertLevel
 
 # Configure logging
@@ -21,20 +25,47 @@ logger = logging.getLogger(__name__)
 # Initialize router
 router = APIRouter(prefix="/api/detection", tags=["detection"])
 
-# Initialize services
-detector = ScreenPeekDetector()
+# Initialize services; the detector is built lazily on first use by get_detector()
 alert_service = AlertService()
 
+# In-process memo so back-to-back status/stats polls share one lookup; entries are
+# kept in insertion-time order so expired ones can be evicted from the front
+ALERT_STATS_MEMO_TTL = 1.0  # seconds
+ALERT_STATS_MEMO_MAX_USERS = 10_000
+alert_stats_memo: Dict[str, Tuple[float, dict]] = OrderedDict()
+
+# Alert type values accepted in detection configuration
+VALID_ALERT_TYPES = frozenset(alert_type.value for alert_type in AlertType)
+
+# Alert types sent when peeking is detected, and their string values
+PEEKING_ALERT_TYPES = (AlertType.VISUAL, AlertType.AUDIO, AlertType.HAPTIC)
+ALERT_TYPE_VALUES = {alert_type: alert_type.value for alert_type in AlertType}
+
+# Maximum accepted length of base64 image data (~3 MB decoded)
+MAX_IMAGE_DATA_LENGTH = 4_000_000
+
 # Pydantic models for request/response
 class DetectionRequest(BaseModel):
     """Request model for detection processing."""
+    model_config = ConfigDict(frozen=True, populate_by_name=True, extra="forbid")
+
     user_id: str
-    image_data: str  # Base64 encoded image
+    image_data: str = Field(..., max_length=MAX_IMAGE_DATA_LENGTH)  # Base64 encoded image
     timestamp: Optional[float] = None
     screen_region: Optional[Dict[str, int]] = None
 
+    @field_validator("image_data")
+    @classmethod
+    def validate_image_data(cls, value: str) -> str:
+        """Reject image data that cannot be padded base64."""
+        if not value or len(value) % 4:
+            raise ValueError("image_data must be non-empty padded base64")
+        return value
+
 class DetectionResponse(BaseModel):
     """Response model for detection results."""
+    model_config = ConfigDict(frozen=True, populate_by_name=True, extra="forbid")
+
     detection_id: str
     user_id: str
     is_peeking: bool
@@ -46,6 +77,8 @@ class DetectionResponse(BaseModel):
 
 class DetectionConfig(BaseModel):
     """Configuration model for detection settings."""
+    model_config = ConfigDict(frozen=True, populate_by_name=True, extra="forbid")
+
     confidence_threshold: float = 0.7
     gaze_threshold: float = 0.3
     screen_region: Optional[Dict[str, int]] = None
@@ -53,6 +86,8 @@ class DetectionConfig(BaseModel):
 
 class DetectionStats(BaseModel):
     """Statistics model for detection data."""
+    model_config = ConfigDict(frozen=True, populate_by_name=True, extra="forbid")
+
     total_detections: int
     peeking_detections: int
     false_positives: int
@@ -60,34 +95,180 @@ class DetectionStats(BaseModel):
     detection_rate: float
     last_detection: Optional[float]
 
+# Interval between heartbeat status updates when no new frames arrive (seconds)
+STATUS_HEARTBEAT_INTERVAL = 30.0
+
+# Worker pool that delivers status updates to websockets
+STATUS_SEND_WORKERS = 4
+STATUS_SEND_QUEUE_SIZE = 10_000
+
+# Per-user connection state
+class UserConnectionState:
+    """Connection state tracked for a single user."""
+    __slots__ = ("websocket", "is_detecting", "has_new_frame", "detection_id_prefix", "detection_update")
+
+    def __init__(self, websocket: WebSocket, user_id: str):
+        self.websocket = websocket
+        self.is_detecting = False
+        self.has_new_frame = False
+        self.detection_id_prefix = f"{user_id}_"
+        # Reused for every detection update; orjson keeps no reference after dumps
+        self.detection_update = {
+            "detection_id": "",
+            "is_peeking": False,
+            "confidence": 0.0,
+            "timestamp": 0.0
+        }
+
 # WebSocket connection manager
 class DetectionConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.detection_tasks: Dict[str, asyncio.Task] = {}
+        self.users: Dict[str, UserConnectionState] = {}
+        self.status_task: Optional[asyncio.Task] = None
+        # Created on first use so they bind to the running event loop, not the importer's
+        self.status_event: Optional[asyncio.Event] = None
+        self.send_queue: Optional[asyncio.Queue] = None
+        self.send_workers: List[asyncio.Task] = []
 
     async def connect(self, websocket: WebSocket, user_id: str):
         await websocket.accept()
-        self.active_connections[user_id] = websocket
+        self.users[user_id] = UserConnectionState(websocket, user_id)
         logger.info(f"User {user_id} connected to detection WebSocket")
 
     def disconnect(self, user_id: str):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-        if user_id in self.detection_tasks:
-            self.detection_tasks[user_id].cancel()
-            del self.detection_tasks[user_id]
+        self.users.pop(user_id, None)
         logger.info(f"User {user_id} disconnected from detection WebSocket")
 
-    async def send_detection_update(self, user_id: str, detection_data: dict):
-        if user_id in self.active_connections:
+    async def send_detection_update(self, user_id: str, detection_id: str,
+                                    is_peeking: bool, confidence: float, timestamp: float):
+        state = self.users.get(user_id)
+        if state:
+            update = state.detection_update
+            update["detection_id"] = detection_id
+            update["is_peeking"] = is_peeking
+            update["confidence"] = confidence
+            update["timestamp"] = timestamp
             try:
-                await self.active_connections[user_id].send_text(json.dumps(detection_data))
+                await state.websocket.send_text(orjson.dumps(update).decode())
             except Exception as e:
                 logger.error(f"Error sending detection update to user {user_id}: {e}")
 
+    def start_detection(self, user_id: str):
+        """Register a user for continuous status updates."""
+        state = self.users.get(user_id)
+        if not state:
+            return
+        state.is_detecting = True
+        self._ensure_status_loop()
+
+    def _ensure_status_loop(self):
+        """Create the loop-bound primitives and start the status loop and send workers."""
+        if self.status_event is None:
+            self.status_event = asyncio.Event()
+        if self.send_queue is None:
+            self.send_queue = asyncio.Queue(maxsize=STATUS_SEND_QUEUE_SIZE)
+        if not self.send_workers:
+            self.send_workers = [
+                asyncio.create_task(self._send_worker()) for _ in range(STATUS_SEND_WORKERS)
+            ]
+        if self.status_task is None or self.status_task.done():
+            self.status_task = asyncio.create_task(self._status_loop())
+
+    def stop_detection(self, user_id: str):
+        """Unregister a user from continuous status updates."""
+        state = self.users.get(user_id)
+        if state:
+            state.is_detecting = False
+            # Wake the status loop so it can exit once nobody is detecting
+            if self.status_event is not None:
+                self.status_event.set()
+
+    def notify_frame_processed(self, user_id: str):
+        """Signal the status loop that a user has a new detection result."""
+        state = self.users.get(user_id)
+        if state and state.is_detecting and self.status_event is not None:
+            state.has_new_frame = True
+            self.status_event.set()
+
+    async def _status_loop(self):
+        """Send shared status updates when frames are processed, plus a periodic heartbeat."""
+        while True:
+            try:
+                # Sleep until a frame is processed; fall back to a heartbeat when idle
+                try:
+                    await asyncio.wait_for(self.status_event.wait(), timeout=STATUS_HEARTBEAT_INTERVAL)
+                    is_heartbeat = False
+                except asyncio.TimeoutError:
+                    is_heartbeat = True
+                self.status_event.clear()
+
+                detecting = [(uid, state) for uid, state in self.users.items() if state.is_detecting]
+                if not detecting:
+                    break
+
+                targets = [(uid, state) for uid, state in detecting if is_heartbeat or state.has_new_frame]
+                if not targets:
+                    continue
+                for _, state in targets:
+                    state.has_new_frame = False
+
+                # Serialize the status update once for all users
+                payload = orjson.dumps({
+                    "type": "status_update",
+                    "is_active": True,
+                    "timestamp": time.time()
+                }).decode()
+
+                # Hand delivery to the worker pool; put() applies back-pressure
+                for uid, _ in targets:
+                    await self.send_queue.put((uid, payload))
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in detection status loop: {e}")
+
+    async def _send_worker(self):
+        """Drain queued status updates and send them to connected users."""
+        while True:
+            user_id, payload = await self.send_queue.get()
+            try:
+                state = self.users.get(user_id)
+                if state:
+                    await state.websocket.send_text(payload)
+            except Exception as e:
+                logger.error(f"Error sending detection update to user {user_id}: {e}")
+            finally:
+                self.send_queue.task_done()
+
 manager = DetectionConnectionManager()
 
+def get_cached_alert_stats(user_id: str) -> dict:
+    """Get alert statistics for a user, served from the in-process memo while fresh."""
+    now = time.time()
+    memo = alert_stats_memo.get(user_id)
+    if memo and now - memo[0] < ALERT_STATS_MEMO_TTL:
+        return memo[1]
+    
+    alert_stats = alert_service.get_alert_stats(user_id)
+    remember_alert_stats(user_id, now, alert_stats)
+    return alert_stats
+
+def remember_alert_stats(user_id: str, now: float, alert_stats: dict):
+    """Memoize a user's alert statistics, evicting expired and excess entries."""
+    alert_stats_memo.pop(user_id, None)
+    alert_stats_memo[user_id] = (now, alert_stats)
+    
+    while alert_stats_memo:
+        oldest_time = next(iter(alert_stats_memo.values()))[0]
+        if now - oldest_time < ALERT_STATS_MEMO_TTL and len(alert_stats_memo) <= ALERT_STATS_MEMO_MAX_USERS:
+            break
+        alert_stats_memo.popitem(last=False)
+
+def invalidate_alert_stats(user_id: str):
+    """Drop cached alert statistics for a user."""
+    alert_stats_memo.pop(user_id, None)
+
 @router.post("/process", response_model=DetectionResponse)
 async def process_detection(request: DetectionRequest):
     """
@@ -100,6 +281,8 @@ async def process_detection(request: DetectionRequest):
         DetectionResponse with detection results
     """
     try:
+        now = time.time()
+        
         # Validate user_id
         if not request.user_id:
             raise HTTPException(status_code=400, detail="User ID is required")
@@ -112,11 +295,17 @@ async def process_detection(request: DetectionRequest):
                 request.screen_region.get("width", 1920),
                 request.screen_region.get("height", 1080)
             )
-            detector.update_screen_region(screen_region)
+            get_detector().update_screen_region(screen_region)
+        
+        # Decode the base64 image data with the SIMD-accelerated codec
+        try:
+            image_bytes = pybase64.b64decode(request.image_data, validate=True)
+        except (binascii.Error, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid base64 image data")
         
         # Process the detection
-        # Note: In a real implementation, you would decode the base64 image data
-        # and process it with the detector. For now, we'll simulate the process.
+        # Note: In a real implementation, image_bytes would be decoded into a frame
+        # and processed with the detector. For now, we'll simulate the process.
         
         # Simulate detection processing
         detection_result = DetectionResult(
@@ -124,45 +313,55 @@ async def process_detection(request: DetectionRequest):
             confidence=0.0,
             face_count=0,
             gaze_angles=[],
-            timestamp=request.timestamp or time.time()
+            timestamp=request.timestamp or now
         )
         
-        # Generate detection ID
-        detection_id = f"{request.user_id}_{int(time.time() * 1000)}"
+        # Generate detection ID, reusing the connected user's precomputed prefix
+        state = manager.users.get(request.user_id)
+        if state:
+            detection_id = state.detection_id_prefix + str(int(now * 1000))
+        else:
+            detection_id = f"{request.user_id}_{int(now * 1000)}"
         
         # Send alerts if peeking detected
         alerts_sent = []
         if detection_result.is_peeking and detection_result.confidence > 0.7:
-            alert_types = [AlertType.VISUAL, AlertType.AUDIO, AlertType.HAPTIC]
             alert_results = await alert_service.send_multiple_alerts(
                 user_id=request.user_id,
-                alert_types=alert_types,
+                alert_types=PEEKING_ALERT_TYPES,
                 level=AlertLevel.MEDIUM,
                 message="Screen peeking detected!",
                 confidence=detection_result.confidence
             )
             
-            alerts_sent = [alert_type.value for alert_type, sent in alert_results.items() if sent]
+            alerts_sent = [ALERT_TYPE_VALUES[alert_type] for alert_type, sent in alert_results.items() if sent]
+            if alerts_sent:
+                invalidate_alert_stats(request.user_id)
         
         # Send real-time update via WebSocket
-        await manager.send_detection_update(request.user_id, {
+        await manager.send_detection_update(
+            request.user_id,
+            detection_id,
+            detection_result.is_peeking,
+            detection_result.confidence,
+            detection_result.timestamp
+        )
+        manager.notify_frame_processed(request.user_id)
+        
+        # response_model validates the dict, so skip building the model here
+        return {
             "detection_id": detection_id,
+            "user_id": request.user_id,
             "is_peeking": detection_result.is_peeking,
             "confidence": detection_result.confidence,
-            "timestamp": detection_result.timestamp
-        })
-        
-        return DetectionResponse(
-            detection_id=detection_id,
-            user_id=request.user_id,
-            is_peeking=detection_result.is_peeking,
-            confidence=detection_result.confidence,
-            face_count=detection_result.face_count,
-            gaze_angles=detection_result.gaze_angles,
-            timestamp=detection_result.timestamp,
-            alerts_sent=alerts_sent
-        )
+            "face_count": detection_result.face_count,
+            "gaze_angles": detection_result.gaze_angles,
+            "timestamp": detection_result.timestamp,
+            "alerts_sent": alerts_sent
+        }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing detection: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -180,14 +379,14 @@ async def get_detection_status(user_id: str):
     """
     try:
         # Get alert statistics
-        alert_stats = alert_service.get_alert_stats(user_id)
+        alert_stats = get_cached_alert_stats(user_id)
         
         # Get detection configuration
-        detector_stats = detector.get_detection_stats()
+        detector_stats = get_detector().get_detection_stats()
         
         return {
             "user_id": user_id,
-            "is_active": user_id in manager.active_connections,
+            "is_active": user_id in manager.users,
             "detection_config": detector_stats,
             "alert_stats": alert_stats,
             "last_update": time.time()
@@ -211,6 +410,7 @@ async def update_detection_config(user_id: str, config: DetectionConfig):
     """
     try:
         # Update detector configuration
+        detector = get_detector()
         detector.confidence_threshold = config.confidence_threshold
         detector.gaze_threshold = config.gaze_threshold
         
@@ -224,15 +424,18 @@ async def update_detection_config(user_id: str, config: DetectionConfig):
             detector.update_screen_region(screen_region)
         
         # Update alert service configuration
-        for alert_type_str in config.alert_types:
-            try:
-                alert_type = AlertType(alert_type_str)
-                # Enable the alert type
-                alert_config = alert_service.alert_configs.get(alert_type_str)
-                if alert_config:
-                    alert_config.enabled = True
-            except ValueError:
-                logger.warning(f"Invalid alert type: {alert_type_str}")
+        requested_types = set(config.alert_types)
+        for alert_type_str in requested_types - VALID_ALERT_TYPES:
+            logger.warning(f"Invalid alert type: {alert_type_str}")
+        for alert_type_str in requested_types & VALID_ALERT_TYPES:
+            # Enable the alert type
+            alert_config = alert_service.alert_configs.get(alert_type_str)
+            if alert_config and not alert_config.enabled:
+                alert_service.update_config(
+                    AlertType(alert_type_str), dataclasses.replace(alert_config, enabled=True)
+                )
+        
+        invalidate_alert_stats(user_id)
         
         return {
             "user_id": user_id,
@@ -262,7 +465,7 @@ async def get_detection_stats(user_id: str):
     """
     try:
         # Get alert statistics
-        alert_stats = alert_service.get_alert_stats(user_id)
+        alert_stats = get_cached_alert_stats(user_id)
         
         # Calculate detection statistics
         total_detections = alert_stats.get("total_alerts", 0)
@@ -297,7 +500,7 @@ async def websocket_detection(websocket: WebSocket, user_id: str):
         while True:
             # Keep connection alive and handle incoming messages
             data = await websocket.receive_text()
-            message = json.loads(data)
+            message = orjson.loads(data)
             
             # Handle different message types
             if message.get("type") == "start_detection":
@@ -305,9 +508,7 @@ async def websocket_detection(websocket: WebSocket, user_id: str):
                 await start_continuous_detection(user_id)
             elif message.get("type") == "stop_detection":
                 # Stop continuous detection
-                if user_id in manager.detection_tasks:
-                    manager.detection_tasks[user_id].cancel()
-                    del manager.detection_tasks[user_id]
+                manager.stop_detection(user_id)
             elif message.get("type") == "update_config":
                 # Update detection configuration
                 config_data = message.get("config", {})
@@ -320,33 +521,14 @@ async def websocket_detection(websocket: WebSocket, user_id: str):
         logger.error(f"WebSocket error for user {user_id}: {e}")
         manager.disconnect(user_id)
 
+@router.on_event("shutdown")
+async def close_alert_service():
+    """Let queued alert callbacks finish before the application exits."""
+    await alert_service.close()
+
 async def start_continuous_detection(user_id: str):
     """Start continuous detection for a user."""
-    if user_id in manager.detection_tasks:
-        return  # Already running
-    
-    async def detection_loop():
-        while True:
-            try:
-                # Simulate detection processing
-                # In a real implementation, this would process camera frames
-                await asyncio.sleep(1)  # Process every second
-                
-                # Send periodic status update
-                await manager.send_detection_update(user_id, {
-                    "type": "status_update",
-                    "is_active": True,
-                    "timestamp": time.time()
-                })
-                
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"Error in detection loop for user {user_id}: {e}")
-                break
-    
-    task = asyncio.create_task(detection_loop())
-    manager.detection_tasks[user_id] = task
+    manager.start_detection(user_id)
 
 @router.delete("/stop/{user_id}")
 async def stop_detection(user_id: str):
@@ -360,9 +542,7 @@ async def stop_detection(user_id: str):
         Success status
     """
     try:
-        if user_id in manager.detection_tasks:
-            manager.detection_tasks[user_id].cancel()
-            del manager.detection_tasks[user_id]
+        manager.stop_detection(user_id)
         
         return {"user_id": user_id, "detection_stopped": True}
         
@@ -4,28 +4,69 @@ Main application entry point with API routes and configuration.
 """
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from starlette.datastructures import Headers
+import asyncio
 import uvicorn
+import orjson
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+def parse_cors_origins(value: str) -> list:
+    """Parse CORS_ORIGINS as a JSON list of origins, or a comma-separated list."""
+    value = value.strip()
+    if not value.startswith("["):
+        return [origin.strip() for origin in value.split(",") if origin.strip()]
+    try:
+        origins = orjson.loads(value)
+    except orjson.JSONDecodeError as e:
+        raise RuntimeError(f"CORS_ORIGINS is not a valid JSON list: {e}") from None
+    if not all(isinstance(origin, str) for origin in origins):
+        raise RuntimeError("CORS_ORIGINS must be a JSON list of origin strings")
+    return origins
+
+# Allowed hosts and CORS origins ("*" keeps the permissive development setup)
+ALLOWED_HOSTS = [host.strip() for host in os.getenv("ALLOWED_HOSTS", "*").split(",") if host.strip()]
+CORS_ORIGINS = parse_cors_origins(os.getenv("CORS_ORIGINS", '["*"]'))
+
+# Upper bound on concurrent WebSocket sends during a broadcast
+BROADCAST_CONCURRENCY = 256
+
+class HostSetMiddleware(TrustedHostMiddleware):
+    """TrustedHostMiddleware with a set lookup for exact hostnames."""
+
+    def __init__(self, app, allowed_hosts, www_redirect: bool = True):
+        super().__init__(app, allowed_hosts=allowed_hosts, www_redirect=www_redirect)
+        self.exact_hosts = frozenset(host for host in self.allowed_hosts if not host.startswith("*"))
+
+    async def __call__(self, scope, receive, send):
+        if not self.allow_any and scope["type"] in ("http", "websocket"):
+            host = Headers(scope=scope).get("host", "").split(":")[0]
+            if host in self.exact_hosts:
+                await self.app(scope, receive, send)
+                return
+        # Wildcard patterns, rejections and redirects use the stock matching
+        await super().__call__(scope, receive, send)
+
 # Initialize FastAPI app
 app = FastAPI(
     title="ScreenGuard Pro API",
     description="Security application API for screen peeking detection",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware for cross-origin requests
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -33,28 +74,41 @@ app.add_middleware(
 
 # Trusted host middleware for security
 app.add_middleware(
-    TrustedHostMiddleware,
-    allowed_hosts=["*"]  # Configure appropriately for production
+    HostSetMiddleware,
+    allowed_hosts=ALLOWED_HOSTS
 )
 
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        self.active_connections: set[WebSocket] = set()
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        connections = list(self.active_connections)
+        semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+
+        async def send(connection: WebSocket):
+            async with semaphore:
+                await connection.send_text(message)
+
+        results = await asyncio.gather(
+            *(send(connection) for connection in connections),
+            return_exceptions=True
+        )
+        # Drop connections whose send failed
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(connection)
 
 manager = ConnectionManager()
 
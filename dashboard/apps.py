@@ -9,3 +9,7 @@ class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
     verbose_name = 'ScreenGuard Dashboard'
+    
+    def ready(self):
+        # Register signal handlers
+        from . import signals  # noqa: F401
@@ -0,0 +1,65 @@
+"""
+Batched channel-layer broadcasting for ScreenGuard Dashboard.
+"""
+
+import asyncio
+import logging
+from channels.layers import get_channel_layer
+from .encoding import dumps_json
+
+logger = logging.getLogger(__name__)
+
+# How long dashboard updates are buffered before being sent to their group (seconds)
+BROADCAST_FLUSH_INTERVAL = 0.05
+
+# Upper bound on concurrent group_send calls during one flush
+BROADCAST_CONCURRENCY = 256
+
+
+class BatchedBroadcaster:
+    """
+    Coalesces dashboard updates per group.
+    
+    Updates queued within one flush interval are sent to each group as a
+    single dashboard_update message. The list of updates is JSON-encoded
+    once here and carried as data_bytes, so consumers forward it without
+    re-encoding.
+    """
+    
+    def __init__(self, flush_interval=BROADCAST_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.pending_updates = {}
+        self.flush_task = None
+    
+    def queue_update(self, group_name, data):
+        """Buffer an update for a group. Must be called from a running event loop."""
+        self.pending_updates.setdefault(group_name, []).append(data)
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self._flush_after_interval())
+    
+    async def _flush_after_interval(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+    
+    async def flush(self):
+        """Send every buffered update, one group_send per group, with bounded concurrency."""
+        pending_updates, self.pending_updates = self.pending_updates, {}
+        channel_layer = get_channel_layer()
+        semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+        
+        async def send(group_name, updates):
+            async with semaphore:
+                try:
+                    await channel_layer.group_send(group_name, {
+                        'type': 'dashboard_update',
+                        'data_bytes': dumps_json(updates)
+                    })
+                except Exception as e:
+                    logger.error(f"Error broadcasting dashboard updates to {group_name}: {e}")
+        
+        await asyncio.gather(*(
+            send(group_name, updates) for group_name, updates in pending_updates.items()
+        ))
+
+
+broadcaster = BatchedBroadcaster()
@@ -2,15 +2,138 @@
 WebSocket consumers for ScreenGuard Dashboard.
 """
 
-import json
+import asyncio
 import logging
+import orjson
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import User
-from .models import Notification, SystemStatus
+from django.db import connection
+from django.utils import timezone
+from .encoding import dumps_json
+from .models import Notification, SystemStatus, UserProfile
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of events coalesced into a single dashboard frame
+MAX_BATCH_SIZE = 128
+
+# Maximum number of events waiting for a slow dashboard client; the oldest are dropped
+MAX_PENDING_EVENTS = 1024
+
+# Window for collecting back-to-back mark_read messages into one UPDATE (seconds)
+MARK_READ_BATCH_WINDOW = 0.01
+
+# Precomputed {"type": ..., "data": ...} envelope bytes for outgoing messages
+ENVELOPE_TYPES = (
+    'dashboard_update',
+    'detection_alert',
+    'system_status_update',
+    'new_notification',
+    'system_status',
+    'status_update',
+)
+ENVELOPE_PREFIXES = {
+    message_type: b'{"type":"' + message_type.encode() + b'","data":'
+    for message_type in ENVELOPE_TYPES
+}
+ENVELOPE_SUFFIX = b'}'
+BATCH_PREFIX = b'{"type":"batch","events":['
+BATCH_SUFFIX = b']}'
+
+# Encoded system status snapshot kept current by one publisher task per process
+SYSTEM_STATUS_POLL_INTERVAL = 5.0  # seconds
+SYSTEM_STATUS_GROUP = 'system_status'
+system_status_cache = {'payload': None, 'publisher': None, 'subscribers': 0}
+
+
+def wrap_envelope(message_type, data_json):
+    """Wrap already-encoded JSON data in a {"type", "data"} message."""
+    return ENVELOPE_PREFIXES[message_type] + data_json + ENVELOPE_SUFFIX
+
+
+def encode_envelope(message_type, data):
+    """Encode a {"type", "data"} message without building the wrapper dict."""
+    return wrap_envelope(message_type, dumps_json(data))
+
+
+def event_envelope(message_type, event):
+    """Build the envelope for a channel event, reusing producer-encoded data_bytes when present."""
+    data_json = event.get('data_bytes')
+    if data_json is None:
+        data_json = dumps_json(event['data'])
+    return wrap_envelope(message_type, data_json)
+
+
+def invalidate_system_status_cache():
+    """Force the next system status request to hit the database."""
+    system_status_cache['payload'] = None
+
+
+@database_sync_to_async
+def load_system_status():
+    """Load current system status as a JSON array of the rows' precomputed JSON."""
+    rows = list(SystemStatus.objects.values_list('id', 'cached_json'))
+    
+    # Rows written before cached_json existed, or changed with update(), have no
+    # blob; encode them from their fields and store the result for next time
+    missing_ids = [row_id for row_id, cached_json in rows if not cached_json]
+    encoded = {}
+    if missing_ids:
+        for values in SystemStatus.objects.filter(id__in=missing_ids).values('id', *SystemStatus.JSON_FIELDS):
+            row_id = values.pop('id')
+            encoded[row_id] = dumps_json(values)
+            SystemStatus.objects.filter(id=row_id, cached_json=b'').update(
+                cached_json=encoded[row_id]
+            )
+    
+    blobs = (cached_json or encoded.get(row_id) for row_id, cached_json in rows)
+    return b'[' + b','.join(blob for blob in blobs if blob) + b']'
+
+
+async def get_system_status():
+    """Return the latest encoded system status snapshot."""
+    payload = system_status_cache['payload']
+    if payload is None:
+        payload = await load_system_status()
+        system_status_cache['payload'] = payload
+    return payload
+
+
+async def _publish_system_status(channel_layer):
+    """Poll system status and broadcast it to the status group whenever it changes."""
+    last_published = None
+    while system_status_cache['subscribers'] > 0:
+        try:
+            payload = await load_system_status()
+            system_status_cache['payload'] = payload
+            if payload != last_published:
+                await channel_layer.group_send(SYSTEM_STATUS_GROUP, {
+                    'type': 'status_update',
+                    'data_bytes': payload
+                })
+                last_published = payload
+        except Exception as e:
+            logger.error(f"Error publishing system status: {e}")
+        await asyncio.sleep(SYSTEM_STATUS_POLL_INTERVAL)
+    system_status_cache['publisher'] = None
+
+
+def ensure_system_status_publisher(channel_layer):
+    """Start the process-wide system status publisher if it is not running."""
+    publisher = system_status_cache['publisher']
+    if publisher is None or publisher.done():
+        system_status_cache['publisher'] = asyncio.create_task(_publish_system_status(channel_layer))
+
+
+@database_sync_to_async
+def load_notification_preferences(user_id):
+    """Load the user's notification preferences, or an empty dict if they have no profile."""
+    preferences = UserProfile.objects.filter(user_id=user_id).values_list(
+        'notification_preferences', flat=True
+    ).first()
+    return preferences or {}
+
 
 class DashboardConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for dashboard real-time updates."""
@@ -18,6 +141,16 @@ class DashboardConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.user_id = self.scope['url_route']['kwargs']['user_id']
         self.room_group_name = f'dashboard_{self.user_id}'
+        self.detections_group_name = f'detections_{self.user_id}'
+        
+        # Streams a client may subscribe to, mapped to this user's group names
+        self.stream_groups = {
+            'detections': self.detections_group_name,
+        }
+        
+        # Outgoing events are batched into frames by a single writer task
+        self.outgoing_events = asyncio.Queue(maxsize=MAX_PENDING_EVENTS)
+        self.writer_task = asyncio.create_task(self._writer_loop())
         
         # Join room group
         await self.channel_layer.group_add(
@@ -26,65 +159,95 @@ class DashboardConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
-        logger.info(f"Dashboard WebSocket connected for user {self.user_id}")
+        logger.debug("Dashboard WebSocket connected for user %s", self.user_id)
     
     async def disconnect(self, close_code):
+        self.writer_task.cancel()
+        
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
-        logger.info(f"Dashboard WebSocket disconnected for user {self.user_id}")
+        logger.debug("Dashboard WebSocket disconnected for user %s", self.user_id)
     
     async def receive(self, text_data):
         """Handle incoming WebSocket messages."""
         try:
-            text_data_json = json.loads(text_data)
+            text_data_json = orjson.loads(text_data)
             message_type = text_data_json.get('type')
             
             if message_type == 'ping':
-                await self.send(text_data=json.dumps({
+                await self.send(text_data=dumps_json({
                     'type': 'pong',
                     'timestamp': text_data_json.get('timestamp')
-                }))
+                }).decode())
+            elif message_type == 'subscribe':
+                await self.update_subscriptions(text_data_json.get('groups', []), subscribe=True)
+            elif message_type == 'unsubscribe':
+                await self.update_subscriptions(text_data_json.get('groups', []), subscribe=False)
             elif message_type == 'subscribe_detections':
                 # Subscribe to detection updates
-                await self.channel_layer.group_add(
-                    f'detections_{self.user_id}',
-                    self.channel_name
-                )
+                await self.update_subscriptions(['detections'], subscribe=True)
             elif message_type == 'unsubscribe_detections':
                 # Unsubscribe from detection updates
-                await self.channel_layer.group_discard(
-                    f'detections_{self.user_id}',
-                    self.channel_name
-                )
+                await self.update_subscriptions(['detections'], subscribe=False)
             
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             logger.error("Invalid JSON received in WebSocket")
         except Exception as e:
             logger.error(f"Error processing WebSocket message: {e}")
     
+    async def update_subscriptions(self, streams, subscribe):
+        """Join or leave the groups for several streams concurrently."""
+        group_names = []
+        for stream in streams:
+            group_name = self.stream_groups.get(stream)
+            if group_name:
+                group_names.append(group_name)
+            else:
+                logger.warning(f"Unknown dashboard stream: {stream}")
+        
+        group_operation = self.channel_layer.group_add if subscribe else self.channel_layer.group_discard
+        await asyncio.gather(*(
+            group_operation(group_name, self.channel_name) for group_name in group_names
+        ))
+    
     async def dashboard_update(self, event):
-        """Send dashboard update to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'dashboard_update',
-            'data': event['data']
-        }))
+        """Queue dashboard updates for the WebSocket; the payload is a list coalesced by the broadcaster."""
+        self._queue_event(event_envelope('dashboard_update', event))
     
     async def detection_alert(self, event):
-        """Send detection alert to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'detection_alert',
-            'data': event['data']
-        }))
+        """Queue detection alert for the WebSocket."""
+        self._queue_event(event_envelope('detection_alert', event))
     
     async def system_status_update(self, event):
-        """Send system status update to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'system_status_update',
-            'data': event['data']
-        }))
+        """Queue system status update for the WebSocket."""
+        self._queue_event(event_envelope('system_status_update', event))
+    
+    def _queue_event(self, envelope):
+        """Queue an encoded event, dropping the oldest one if the client has fallen behind."""
+        if self.outgoing_events.full():
+            self.outgoing_events.get_nowait()
+            logger.warning("Dashboard client %s is falling behind, dropping oldest event", self.user_id)
+        self.outgoing_events.put_nowait(envelope)
+    
+    async def _writer_loop(self):
+        """Drain queued events and send them as batched frames."""
+        while True:
+            # Wait for the first event, then take whatever else is ready
+            batch = [await self.outgoing_events.get()]
+            while len(batch) < MAX_BATCH_SIZE:
+                try:
+                    batch.append(self.outgoing_events.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            
+            try:
+                frame = BATCH_PREFIX + b','.join(batch) + BATCH_SUFFIX
+                await self.send(text_data=frame.decode())
+            except Exception as e:
+                logger.error(f"Error sending dashboard batch: {e}")
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
@@ -94,6 +257,10 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         self.user_id = self.scope['url_route']['kwargs']['user_id']
         self.room_group_name = f'notifications_{self.user_id}'
         
+        # Notification IDs waiting to be marked read in the next batch
+        self.pending_read_ids = set()
+        self.mark_read_task = None
+        
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
@@ -101,71 +268,114 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
-        logger.info(f"Notification WebSocket connected for user {self.user_id}")
+        
+        # Read once per connection; profile_updated events refresh it
+        self.notification_preferences = await load_notification_preferences(self.user_id)
+        logger.debug("Notification WebSocket connected for user %s", self.user_id)
     
     async def disconnect(self, close_code):
+        # Write out any mark_read messages still waiting for their batch
+        if self.mark_read_task is not None and not self.mark_read_task.done():
+            await self.mark_read_task
+        if self.pending_read_ids:
+            await self._flush_pending_reads()
+        
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
-        logger.info(f"Notification WebSocket disconnected for user {self.user_id}")
+        logger.debug("Notification WebSocket disconnected for user %s", self.user_id)
     
     async def receive(self, text_data):
         """Handle incoming WebSocket messages."""
         try:
-            text_data_json = json.loads(text_data)
+            text_data_json = orjson.loads(text_data)
             message_type = text_data_json.get('type')
             
             if message_type == 'mark_read':
                 notification_id = text_data_json.get('notification_id')
-                await self.mark_notification_read(notification_id)
+                self.pending_read_ids.add(notification_id)
+                if self.mark_read_task is None or self.mark_read_task.done():
+                    self.mark_read_task = asyncio.create_task(self._flush_pending_reads())
             elif message_type == 'mark_all_read':
-                await self.mark_all_notifications_read()
+                notification_ids = await self.mark_all_notifications_read()
+                await self.send(text_data=dumps_json({
+                    'type': 'marked_all',
+                    'ids': notification_ids
+                }).decode())
             
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             logger.error("Invalid JSON received in notification WebSocket")
         except Exception as e:
             logger.error(f"Error processing notification WebSocket message: {e}")
     
     async def new_notification(self, event):
-        """Send new notification to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'new_notification',
-            'data': event['data']
-        }))
+        """
+        Send new notification to WebSocket.
+        
+        Producers may put the notification's type in the event as 'notification_type';
+        types the user has switched off in their notification preferences are not sent.
+        """
+        notification_type = event.get('notification_type')
+        if notification_type and self.notification_preferences.get(notification_type) is False:
+            return
+        await self.send(text_data=event_envelope('new_notification', event).decode())
     
-    @database_sync_to_async
-    def mark_notification_read(self, notification_id):
-        """Mark a notification as read."""
-        try:
-            notification = Notification.objects.get(
-                id=notification_id,
-                user_id=self.user_id
-            )
-            notification.mark_as_read()
-            return True
-        except Notification.DoesNotExist:
-            return False
+    async def profile_updated(self, event):
+        """Reload the cached notification preferences after the user's profile changed."""
+        self.notification_preferences = await load_notification_preferences(self.user_id)
+    
+    async def _flush_pending_reads(self):
+        """Mark all notifications collected during the batch window as read."""
+        await asyncio.sleep(MARK_READ_BATCH_WINDOW)
+        # IDs that arrive while an UPDATE is running go out in the next pass
+        while self.pending_read_ids:
+            notification_ids = list(self.pending_read_ids)
+            self.pending_read_ids.clear()
+            try:
+                await self.mark_notifications_read(notification_ids)
+            except Exception as e:
+                logger.error(f"Error marking notifications as read: {e}")
     
     @database_sync_to_async
-    def mark_all_notifications_read(self):
-        """Mark all notifications as read for the user."""
-        from django.utils import timezone
-        return Notification.objects.filter(
+    def mark_notifications_read(self, notification_ids):
+        """Mark notifications as read with a single UPDATE."""
+        updated_count = Notification.objects.filter(
+            id__in=notification_ids,
             user_id=self.user_id,
             is_read=False
         ).update(
             is_read=True,
             read_at=timezone.now()
         )
+        if updated_count:
+            Notification.invalidate_recent_unread(self.user_id)
+        return updated_count
+    
+    @database_sync_to_async
+    def mark_all_notifications_read(self):
+        """Mark all notifications as read for the user and return their IDs."""
+        # UPDATE ... RETURNING gives back the changed IDs without a second SELECT
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {Notification._meta.db_table} "
+                "SET is_read = %s, read_at = %s "
+                "WHERE user_id = %s AND is_read = %s "
+                "RETURNING id",
+                [True, timezone.now(), self.user_id, False]
+            )
+            notification_ids = [row[0] for row in cursor.fetchall()]
+        if notification_ids:
+            Notification.invalidate_recent_unread(self.user_id)
+        return notification_ids
 
 
 class SystemStatusConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for system status updates."""
     
     async def connect(self):
-        self.room_group_name = 'system_status'
+        self.room_group_name = SYSTEM_STATUS_GROUP
         
         # Join room group
         await self.channel_layer.group_add(
@@ -174,7 +384,9 @@ class SystemStatusConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
-        logger.info("System status WebSocket connected")
+        system_status_cache['subscribers'] += 1
+        ensure_system_status_publisher(self.channel_layer)
+        logger.debug("System status WebSocket connected")
     
     async def disconnect(self, close_code):
         # Leave room group
@@ -182,46 +394,25 @@ class SystemStatusConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
-        logger.info("System status WebSocket disconnected")
+        system_status_cache['subscribers'] = max(system_status_cache['subscribers'] - 1, 0)
+        logger.debug("System status WebSocket disconnected")
     
     async def receive(self, text_data):
         """Handle incoming WebSocket messages."""
         try:
-            text_data_json = json.loads(text_data)
+            text_data_json = orjson.loads(text_data)
             message_type = text_data_json.get('type')
             
             if message_type == 'get_status':
                 # Send current system status
-                status_data = await self.get_system_status()
-                await self.send(text_data=json.dumps({
-                    'type': 'system_status',
-                    'data': status_data
-                }))
+                status_json = await get_system_status()
+                await self.send(text_data=wrap_envelope('system_status', status_json).decode())
             
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             logger.error("Invalid JSON received in system status WebSocket")
         except Exception as e:
             logger.error(f"Error processing system status WebSocket message: {e}")
     
     async def status_update(self, event):
         """Send system status update to WebSocket."""
-        await self.send(text_data=json.dumps({
-            'type': 'status_update',
-            'data': event['data']
-        }))
-    
-    @database_sync_to_async
-    def get_system_status(self):
-        """Get current system status."""
-        status_objects = SystemStatus.objects.all()
-        return [
-            {
-                'service_name': status.service_name,
-                'status': status.status,
-                'message': status.message,
-                'last_check': status.last_check.isoformat(),
-                'response_time': status.response_time,
-                'metadata': status.metadata
-            }
-            for status in status_objects
-        ]
+        await self.send(text_data=event_envelope('status_update', event).decode())
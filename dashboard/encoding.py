@@ -0,0 +1,21 @@
+"""
+JSON encoding helpers for ScreenGuard Dashboard.
+"""
+
+from decimal import Decimal
+import orjson
+
+# orjson options shared by every outgoing payload
+JSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+def _json_default(obj):
+    """Serialize types orjson does not handle natively."""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps_json(obj):
+    """Encode obj with orjson; datetimes are written natively as UTC."""
+    return orjson.dumps(obj, default=_json_default, option=JSON_OPTIONS)
@@ -3,8 +3,11 @@ Dashboard models for ScreenGuard Pro.
 """
 
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.utils import timezone
+from .encoding import dumps_json
 
 
 class UserProfile(models.Model):
@@ -48,6 +51,27 @@ class DashboardSettings(models.Model):
         return f"{self.user.username} Dashboard Settings"
 
 
+class SystemStatusQuerySet(models.QuerySet):
+    """Keeps SystemStatus.cached_json in step on writes that bypass save()."""
+    
+    def update(self, **kwargs):
+        # Blank the blob so readers re-encode the rows from their fields
+        kwargs.setdefault('cached_json', b'')
+        return super().update(**kwargs)
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.refresh_cached_json()
+        return super().bulk_create(objs, *args, **kwargs)
+    
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.refresh_cached_json()
+        return super().bulk_update(objs, {*fields, 'cached_json'}, *args, **kwargs)
+
+
 class SystemStatus(models.Model):
     """System status and health monitoring."""
     
@@ -61,9 +85,17 @@ class SystemStatus(models.Model):
     service_name = models.CharField(max_length=100)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
     message = models.TextField(blank=True)
-    last_check = models.DateTimeField(auto_now=True)
+    last_check = models.DateTimeField(default=timezone.now)  # stamped on every save()
     response_time = models.FloatField(null=True, blank=True)  # milliseconds
     metadata = models.JSONField(default=dict)
+    # JSON for this row as sent to status WebSocket clients, refreshed on save();
+    # empty when the row has not been encoded yet
+    cached_json = models.BinaryField(default=b'', editable=False)
+    
+    # Fields included in cached_json
+    JSON_FIELDS = ('service_name', 'status', 'message', 'last_check', 'response_time', 'metadata')
+    
+    objects = SystemStatusQuerySet.as_manager()
     
     class Meta:
         verbose_name_plural = 'System Status'
@@ -71,6 +103,19 @@ class SystemStatus(models.Model):
     
     def __str__(self):
         return f"{self.service_name} - {self.status}"
+    
+    def save(self, *args, **kwargs):
+        """Stamp last_check and precompute the row's JSON before writing."""
+        self.last_check = timezone.now()
+        self.refresh_cached_json()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'last_check', 'cached_json'}
+        super().save(*args, **kwargs)
+    
+    def refresh_cached_json(self):
+        """Re-encode cached_json from the row's current field values."""
+        self.cached_json = dumps_json({field: getattr(self, field) for field in self.JSON_FIELDS})
 
 
 class ActivityLog(models.Model):
@@ -131,13 +176,25 @@ class Notification(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['user', 'is_read']),
-            models.Index(fields=['created_at']),
+            # Partial index covering only unread rows, used by unread counts and mark-all-read
+            models.Index(fields=['user'], condition=Q(is_read=False), name='notif_user_unread_idx'),
+            # Serves the per-user notification list ordered newest first without a sort step
+            models.Index(fields=['user', '-created_at'], name='notif_user_createdat_desc'),
         ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
     
+    @staticmethod
+    def recent_unread_cache_key(user_id):
+        """Cache key for the user's recent unread notifications shown on the dashboard."""
+        return f'unread_notifs:{user_id}'
+    
+    @classmethod
+    def invalidate_recent_unread(cls, user_id):
+        """Drop the user's cached recent unread notifications."""
+        cache.delete(cls.recent_unread_cache_key(user_id))
+    
     def mark_as_read(self):
         """Mark notification as read."""
         if not self.is_read:
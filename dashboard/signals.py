@@ -0,0 +1,46 @@
+"""
+Signal handlers for ScreenGuard Dashboard.
+"""
+
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Notification, SystemStatus, UserProfile
+from .consumers import invalidate_system_status_cache
+
+logger = logging.getLogger(__name__)
+
+
+@receiver([post_save, post_delete], sender=SystemStatus)
+def system_status_changed(sender, **kwargs):
+    """Drop the cached system status snapshot when a row changes."""
+    invalidate_system_status_cache()
+
+
+@receiver([post_save, post_delete], sender=Notification)
+def notification_changed(sender, instance, **kwargs):
+    """Drop the user's cached recent unread notifications when one changes."""
+    Notification.invalidate_recent_unread(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def user_profile_changed(sender, instance, **kwargs):
+    """Tell the user's open notification sockets to reload their cached preferences."""
+    user_id = instance.user_id
+    
+    def notify():
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        # The profile write has already committed; a missed refresh must not fail it
+        try:
+            async_to_sync(channel_layer.group_send)(
+                f'notifications_{user_id}', {'type': 'profile_updated'}
+            )
+        except Exception as e:
+            logger.warning("Could not send profile_updated for user %s: %s", user_id, e)
+    
+    transaction.on_commit(notify)
@@ -6,7 +6,10 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db.models import Count, F, Q
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
@@ -15,14 +18,89 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 import requests
-import json
 import logging
+import orjson
 
+from .encoding import dumps_json
 from .models import UserProfile, DashboardSettings, SystemStatus, ActivityLog, Notification
-from .serializers import DashboardDataSerializer, SystemStatusSerializer
 
 logger = logging.getLogger(__name__)
 
+# How long the dashboard's recent unread notifications stay cached
+RECENT_UNREAD_CACHE_TIMEOUT = 30  # seconds
+
+# Rows fetched per database round-trip when streaming notification lists
+NOTIFICATION_CHUNK_SIZE = 200
+
+# Dashboard data after the "user" block, which is spliced in per request
+_DASHBOARD_DATA_TAIL_JSON = b',' + orjson.dumps({
+    'stats': {
+        'total_devices': 2,
+        'active_detections': 1,
+        'alerts_today': 3,
+        'detection_accuracy': 94.5,
+    },
+    'recent_activity': [
+        {
+            'action': 'Device Connected',
+            'timestamp': '2024-01-15T14:30:25Z',
+            'description': 'iPhone 13 connected successfully'
+        },
+        {
+            'action': 'Alert Triggered',
+            'timestamp': '2024-01-15T14:25:10Z',
+            'description': 'Screen peeking detected on MacBook Pro'
+        }
+    ],
+    'system_status': [
+        {
+            'service': 'Detection API',
+            'status': 'healthy',
+            'response_time': 45.2
+        },
+        {
+            'service': 'Alert Service',
+            'status': 'healthy',
+            'response_time': 12.8
+        }
+    ]
+})[1:]
+
+# Mock data for demonstration - in production, this would come from API calls
+_OVERVIEW_STATIC_CONTEXT = {
+    'total_devices': 2,
+    'active_detections': 1,
+    'alerts_today': 3,
+    'detection_accuracy': 94.5,
+    'recent_detections': (
+        {
+            'device_name': 'iPhone 13',
+            'timestamp': '2024-01-15 14:30:25',
+            'confidence': 0.87,
+            'alert_sent': True
+        },
+        {
+            'device_name': 'MacBook Pro',
+            'timestamp': '2024-01-15 14:25:10',
+            'confidence': 0.92,
+            'alert_sent': True
+        }
+    ),
+    # Lists, not tuples: the template inlines these into JavaScript via |safe
+    'chart_data': {
+        'detections_over_time': [
+            {'date': '2024-01-15', 'count': 12},
+            {'date': '2024-01-14', 'count': 8},
+            {'date': '2024-01-13', 'count': 15},
+        ],
+        'alert_types': [
+            {'type': 'Visual', 'count': 5},
+            {'type': 'Audio', 'count': 3},
+            {'type': 'Haptic', 'count': 7},
+        ]
+    }
+}
+
 
 class DashboardView(TemplateView):
     """Main dashboard view."""
@@ -33,10 +111,16 @@ class DashboardView(TemplateView):
         if self.request.user.is_authenticated:
             context['user_profile'] = getattr(self.request.user, 'profile', None)
             context['dashboard_settings'] = getattr(self.request.user, 'dashboard_settings', None)
-            context['recent_notifications'] = Notification.objects.filter(
-                user=self.request.user,
-                is_read=False
-            )[:5]
+            user = self.request.user
+            # Invalidated by the Notification signals and the bulk mark-read paths
+            context['recent_notifications'] = cache.get_or_set(
+                Notification.recent_unread_cache_key(user.id),
+                lambda: list(Notification.objects.filter(
+                    user=user,
+                    is_read=False
+                ).values('id', 'title', 'message', 'created_at')[:5]),
+                timeout=RECENT_UNREAD_CACHE_TIMEOUT
+            )
         return context
 
 
@@ -47,40 +131,12 @@ def dashboard_overview(request):
         # Get user's devices and recent activity
         user = request.user
         
-        # Mock data for demonstration - in production, this would come from API calls
         context = {
             'user': user,
-            'total_devices': 2,
-            'active_detections': 1,
-            'alerts_today': 3,
-            'detection_accuracy': 94.5,
-            'recent_detections': [
-                {
-                    'device_name': 'iPhone 13',
-                    'timestamp': '2024-01-15 14:30:25',
-                    'confidence': 0.87,
-                    'alert_sent': True
-                },
-                {
-                    'device_name': 'MacBook Pro',
-                    'timestamp': '2024-01-15 14:25:10',
-                    'confidence': 0.92,
-                    'alert_sent': True
-                }
-            ],
-            'system_status': SystemStatus.objects.all()[:5],
-            'chart_data': {
-                'detections_over_time': [
-                    {'date': '2024-01-15', 'count': 12},
-                    {'date': '2024-01-14', 'count': 8},
-                    {'date': '2024-01-13', 'count': 15},
-                ],
-                'alert_types': [
-                    {'type': 'Visual', 'count': 5},
-                    {'type': 'Audio', 'count': 3},
-                    {'type': 'Haptic', 'count': 7},
-                ]
-            }
+            **_OVERVIEW_STATIC_CONTEXT,
+            'system_status': SystemStatus.objects.only(
+                'service_name', 'status', 'message', 'last_check', 'response_time'
+            )[:5],
         }
         
         return render(request, 'dashboard/overview.html', context)
@@ -98,48 +154,17 @@ def dashboard_data_api(request):
     try:
         user = request.user
         
-        # Get dashboard data
-        dashboard_data = {
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'last_login': user.last_login,
-            },
-            'stats': {
-                'total_devices': 2,
-                'active_detections': 1,
-                'alerts_today': 3,
-                'detection_accuracy': 94.5,
-            },
-            'recent_activity': [
-                {
-                    'action': 'Device Connected',
-                    'timestamp': '2024-01-15T14:30:25Z',
-                    'description': 'iPhone 13 connected successfully'
-                },
-                {
-                    'action': 'Alert Triggered',
-                    'timestamp': '2024-01-15T14:25:10Z',
-                    'description': 'Screen peeking detected on MacBook Pro'
-                }
-            ],
-            'system_status': [
-                {
-                    'service': 'Detection API',
-                    'status': 'healthy',
-                    'response_time': 45.2
-                },
-                {
-                    'service': 'Alert Service',
-                    'status': 'healthy',
-                    'response_time': 12.8
-                }
-            ]
-        }
-        
-        serializer = DashboardDataSerializer(dashboard_data)
-        return Response(serializer.data)
+        # Only the user block varies per request; the rest is pre-encoded mock data
+        user_json = orjson.dumps({
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'last_login': user.last_login,
+        })
+        return HttpResponse(
+            b'{"user":' + user_json + _DASHBOARD_DATA_TAIL_JSON,
+            content_type='application/json'
+        )
         
     except Exception as e:
         logger.error(f"Error in dashboard data API: {e}")
@@ -154,9 +179,11 @@ def dashboard_data_api(request):
 def system_status_api(request):
     """API endpoint for system status."""
     try:
-        status_objects = SystemStatus.objects.all()
-        serializer = SystemStatusSerializer(status_objects, many=True)
-        return Response(serializer.data)
+        # Same fields as SystemStatusSerializer, read as plain dicts without model instances
+        status_rows = SystemStatus.objects.values(
+            'id', 'service_name', 'status', 'message', 'last_check', 'response_time', 'metadata'
+        )
+        return HttpResponse(orjson.dumps(list(status_rows)), content_type='application/json')
         
     except Exception as e:
         logger.error(f"Error in system status API: {e}")
@@ -223,6 +250,27 @@ def update_dashboard_settings(request):
         )
 
 
+def _notification_list_chunks(first_row, rows, counts):
+    """
+    Yield the notification list response as JSON fragments, one row at a time.
+    
+    The counts go first, and if reading a later row fails the array is closed
+    and an "error" key added, so the body stays valid JSON either way.
+    """
+    yield (b'{"total_count":' + dumps_json(counts['total']) +
+           b',"unread_count":' + dumps_json(counts['unread']) + b',"notifications":[')
+    try:
+        if first_row is not None:
+            yield dumps_json(first_row)
+            for row in rows:
+                yield b',' + dumps_json(row)
+    except Exception as e:
+        logger.error(f"Error streaming notifications: {e}")
+        yield b'],"error":"Failed to fetch notifications"}'
+        return
+    yield b']}'
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def notifications_api(request):
@@ -236,27 +284,32 @@ def notifications_api(request):
         if unread_only:
             notifications = notifications.filter(is_read=False)
         
-        notifications = notifications[:limit]
+        # Build the response rows in the database instead of instantiating models,
+        # streaming them from the cursor rather than materializing the list
+        rows = notifications.values(
+            'id',
+            'title',
+            'message',
+            'is_read',
+            'is_important',
+            'action_url',
+            'created_at',
+            'read_at',
+            type=F('notification_type'),
+        )[:limit].iterator(chunk_size=NOTIFICATION_CHUNK_SIZE)
         
-        data = []
-        for notification in notifications:
-            data.append({
-                'id': notification.id,
-                'title': notification.title,
-                'message': notification.message,
-                'type': notification.notification_type,
-                'is_read': notification.is_read,
-                'is_important': notification.is_important,
-                'action_url': notification.action_url,
-                'created_at': notification.created_at.isoformat(),
-                'read_at': notification.read_at.isoformat() if notification.read_at else None,
-            })
+        # Run the query and the counts before the response starts, so failures
+        # there still return a 500
+        first_row = next(rows, None)
+        counts = Notification.objects.filter(user=user).aggregate(
+            total=Count('id'),
+            unread=Count('id', filter=Q(is_read=False))
+        )
         
-        return Response({
-            'notifications': data,
-            'total_count': Notification.objects.filter(user=user).count(),
-            'unread_count': Notification.objects.filter(user=user, is_read=False).count(),
-        })
+        return StreamingHttpResponse(
+            _notification_list_chunks(first_row, rows, counts),
+            content_type='application/json'
+        )
         
     except Exception as e:
         logger.error(f"Error in notifications API: {e}")
@@ -273,18 +326,21 @@ def mark_notification_read(request, notification_id):
     try:
         user = request.user
         
-        try:
-            notification = Notification.objects.get(id=notification_id, user=user)
-            notification.mark_as_read()
-            
-            return Response({'message': 'Notification marked as read'})
-            
-        except Notification.DoesNotExist:
+        # Single UPDATE; only a miss needs a second query to tell 404 from already-read
+        updated_count = Notification.objects.filter(
+            id=notification_id, user=user, is_read=False
+        ).update(is_read=True, read_at=timezone.now())
+        
+        if updated_count:
+            Notification.invalidate_recent_unread(user.id)
+        elif not Notification.objects.filter(id=notification_id, user=user).exists():
             return Response(
                 {'error': 'Notification not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
+        return Response({'message': 'Notification marked as read'})
+        
     except Exception as e:
         logger.error(f"Error marking notification as read: {e}")
         return Response(
@@ -307,6 +363,7 @@ def mark_all_notifications_read(request):
             is_read=True,
             read_at=timezone.now()
         )
+        Notification.invalidate_recent_unread(user.id)
         
         return Response({
             'message': f'{updated_count} notifications marked as read'
@@ -322,8 +379,8 @@ def mark_all_notifications_read(request):
 
 def health_check(request):
     """Health check endpoint for monitoring."""
-    return JsonResponse({
+    return HttpResponse(orjson.dumps({
         'status': 'healthy',
         'service': 'screenguard-dashboard',
-        'timestamp': timezone.now().isoformat()
-    })
+        'timestamp': timezone.now()
+    }), content_type='application/json')
@@ -2,27 +2,19 @@
 Detections views for ScreenGuard Pro.
 """
 
+from django.http import HttpResponse
 from django.shortcuts import render
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import status
 import logging
+import time
+import orjson
 
 logger = logging.getLogger(__name__)
 
-
-def detection_list(request):
-    """Detection list view."""
-    return render(request, 'detections/list.html')
-
-
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def detection_list_api(request):
-    """API endpoint for detection list."""
-    # Mock data for demonstration
-    detections = [
+_DETECTION_LIST_JSON = orjson.dumps({
+    'detections': [
         {
             'id': 1,
             'device_name': 'iPhone 13',
@@ -42,8 +34,29 @@ def detection_list_api(request):
             'gaze_angles': [12.1, 5.3]
         }
     ]
-    
-    return Response({'detections': detections})
+})
+
+_DETECTION_STATS_JSON = orjson.dumps({
+    'total_detections': 156,
+    'peeking_detections': 23,
+    'false_positives': 2,
+    'average_confidence': 0.89,
+    'detection_rate': 0.15,
+    'last_detection': '2024-01-15T14:30:25Z'
+})
+
+
+def detection_list(request):
+    """Detection list view."""
+    return render(request, 'detections/list.html')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def detection_list_api(request):
+    """API endpoint for detection list."""
+    # Mock data for demonstration
+    return HttpResponse(_DETECTION_LIST_JSON, content_type='application/json')
 
 
 @api_view(['POST'])
@@ -74,13 +87,4 @@ def stop_detection_api(request):
 @permission_classes([IsAuthenticated])
 def detection_stats_api(request):
     """API endpoint for detection statistics."""
-    stats = {
-        'total_detections': 156,
-        'peeking_detections': 23,
-        'false_positives': 2,
-        'average_confidence': 0.89,
-        'detection_rate': 0.15,
-        'last_detection': '2024-01-15T14:30:25Z'
-    }
-    
-    return Response(stats)
+    return HttpResponse(_DETECTION_STATS_JSON, content_type='application/json')
@@ -2,27 +2,18 @@
 Devices views for ScreenGuard Pro.
 """
 
+from django.http import HttpResponse
 from django.shortcuts import render
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import status
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
-
-def device_list(request):
-    """Device list view."""
-    return render(request, 'devices/list.html')
-
-
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def device_list_api(request):
-    """API endpoint for device list."""
-    # Mock data for demonstration
-    devices = [
+_DEVICE_LIST_JSON = orjson.dumps({
+    'devices': [
         {
             'id': 1,
             'name': 'iPhone 13',
@@ -42,8 +33,35 @@ def device_list_api(request):
             'detection_active': False
         }
     ]
-    
-    return Response({'devices': devices})
+})
+
+# Device detail fields after "id", which is spliced in per request
+_DEVICE_DETAIL_TAIL_JSON = b',' + orjson.dumps({
+    'name': 'iPhone 13',
+    'type': 'mobile',
+    'os': 'iOS 17.0',
+    'status': 'connected',
+    'last_seen': '2024-01-15T14:30:25Z',
+    'detection_active': True,
+    'settings': {
+        'sensitivity': 0.7,
+        'alert_types': ['visual', 'audio', 'haptic'],
+        'screen_region': {'x': 0, 'y': 0, 'width': 375, 'height': 812}
+    }
+})[1:]
+
+
+def device_list(request):
+    """Device list view."""
+    return render(request, 'devices/list.html')
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def device_list_api(request):
+    """API endpoint for device list."""
+    # Mock data for demonstration
+    return HttpResponse(_DEVICE_LIST_JSON, content_type='application/json')
 
 
 @api_view(['GET'])
@@ -51,22 +69,10 @@ def device_list_api(request):
 def device_detail_api(request, device_id):
     """API endpoint for device detail."""
     # Mock data for demonstration
-    device = {
-        'id': device_id,
-        'name': 'iPhone 13',
-        'type': 'mobile',
-        'os': 'iOS 17.0',
-        'status': 'connected',
-        'last_seen': '2024-01-15T14:30:25Z',
-        'detection_active': True,
-        'settings': {
-            'sensitivity': 0.7,
-            'alert_types': ['visual', 'audio', 'haptic'],
-            'screen_region': {'x': 0, 'y': 0, 'width': 375, 'height': 812}
-        }
-    }
-    
-    return Response(device)
+    return HttpResponse(
+        b'{"id":' + orjson.dumps(device_id) + _DEVICE_DETAIL_TAIL_JSON,
+        content_type='application/json'
+    )
 
 
 @api_view(['POST'])
@@ -3,20 +3,33 @@ Screen Peek Detection Model
 Core computer vision model for detecting when someone is peering at the screen.
 """
 
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
 import mediapipe as mp
 from typing import List, Tuple, Optional
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Process-wide detector, built on first use by get_detector()
+_DETECTOR = None
+_DETECTOR_LOCK = threading.Lock()
+
+@dataclass(frozen=True)
 class DetectionResult:
     """Data class for detection results."""
+    # Declared by hand rather than with dataclass(slots=True), which needs Python 3.10
+    __slots__ = ('is_peeking', 'confidence', 'face_count', 'gaze_angles', 'timestamp')
+    
     is_peeking: bool
     confidence: float
     face_count: int
@@ -31,10 +44,32 @@ class ScreenPeekDetector:
     if someone is looking at the user's screen.
     """
     
+    # MediaPipe face mesh landmark indices used for gaze estimation
+    LEFT_EYE_IDX = (33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246)
+    RIGHT_EYE_IDX = (362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398)
+    NOSE_TIP_IDX = 1
+    
+    # Landmarks gathered by _landmarks_to_np, and their rows in the gathered array
+    GAZE_LANDMARK_IDX = LEFT_EYE_IDX + RIGHT_EYE_IDX + (NOSE_TIP_IDX,)
+    GAZE_LANDMARK_COUNT = max(GAZE_LANDMARK_IDX) + 1  # landmarks a mesh needs for gaze
+    LEFT_EYE_ROWS = slice(0, len(LEFT_EYE_IDX))
+    RIGHT_EYE_ROWS = slice(len(LEFT_EYE_IDX), len(LEFT_EYE_IDX) + len(RIGHT_EYE_IDX))
+    NOSE_TIP_ROW = len(GAZE_LANDMARK_IDX) - 1
+    
+    # Static-frame cache: frames whose coarse thumbnail matches the previous one
+    # within FRAME_CACHE_MAX_AGE seconds reuse its result instead of re-running inference
+    FRAME_FINGERPRINT_SIZE = (32, 32)
+    FRAME_FINGERPRINT_SHIFT = 4  # drop low bits so sensor noise does not break matches
+    FRAME_CACHE_MAX_AGE = 0.5
+    
+    # Upper bound on threads used by process_batch
+    MAX_BATCH_WORKERS = 4
+    
     def __init__(self, 
                  confidence_threshold: float = 0.7,
                  gaze_threshold: float = 0.3,
-                 screen_region: Optional[Tuple[int, int, int, int]] = None):
+                 screen_region: Optional[Tuple[int, int, int, int]] = None,
+                 max_input_side: int = 640):
         """
         Initialize the screen peek detector.
         
@@ -42,17 +77,22 @@ class ScreenPeekDetector:
             confidence_threshold: Minimum confidence for face detection
             gaze_threshold: Threshold for determining if gaze is directed at screen
             screen_region: Screen region coordinates (x, y, width, height)
+            max_input_side: Frames are downscaled so their longer side is at most
+                this many pixels before inference
         """
         self.confidence_threshold = confidence_threshold
         self.gaze_threshold = gaze_threshold
         self.screen_region = screen_region
+        self.max_input_side = max_input_side
         
         # Initialize MediaPipe solutions
         self.mp_face_detection = mp.solutions.face_detection
         self.mp_face_mesh = mp.solutions.face_mesh
         self.mp_drawing = mp.solutions.drawing_utils
         
-        # Initialize face detection
+        # Initialize face detection; the graph already drops detections below
+        # this confidence, so detect_faces only re-checks if the threshold is raised later
+        self._graph_min_confidence = confidence_threshold
         self.face_detection = self.mp_face_detection.FaceDetection(
             model_selection=0,  # 0 for short-range, 1 for full-range
             min_detection_confidence=confidence_threshold
@@ -67,6 +107,25 @@ class ScreenPeekDetector:
             min_tracking_confidence=0.5
         )
         
+        # Reusable downscale and RGB conversion buffers, reallocated only when the frame shape changes
+        self._small_buf = None
+        self._rgb_buf = None
+        
+        # Last processed frame fingerprint and result, see FRAME_CACHE_MAX_AGE
+        self._last_frame_key = None
+        self._last_result = None
+        self.frame_cache_hits = 0
+        self.frame_cache_misses = 0
+        
+        # Single worker: the MediaPipe graphs and the buffers above are not safe
+        # to use from several threads at once
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='screen-peek')
+        
+        # process_batch workers, each with its own detector (and MediaPipe graphs)
+        # built on first use in that thread
+        self._batch_executor = None
+        self._batch_local = threading.local()
+        
         logger.info("ScreenPeekDetector initialized successfully")
     
     def detect_faces(self, frame: np.ndarray) -> List[dict]:
@@ -79,106 +138,117 @@ class ScreenPeekDetector:
         Returns:
             List of face detection results
         """
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_detection.process(rgb_frame)
-        
-        faces = []
-        if results.detections:
-            for detection in results.detections:
-                bbox = detection.location_data.relative_bounding_box
-                confidence = detection.score[0]
-                
-                if confidence >= self.confidence_threshold:
-                    faces.append({
-                        'bbox': bbox,
-                        'confidence': confidence,
-                        'landmarks': detection.location_data.relative_keypoints
-                    })
+        self._rgb_buf = self._to_rgb(frame, self._rgb_buf)
+        results = self.face_detection.process(self._rgb_buf)
+        
+        faces = [
+            {
+                'bbox': detection.location_data.relative_bounding_box,
+                'confidence': detection.score[0],
+                'landmarks': detection.location_data.relative_keypoints
+            }
+            for detection in results.detections or ()
+        ]
+        
+        if self.confidence_threshold > self._graph_min_confidence:
+            faces = [face for face in faces if face['confidence'] >= self.confidence_threshold]
         
         return faces
     
-    def estimate_gaze_direction(self, frame: np.ndarray, face_bbox: dict) -> Tuple[float, float]:
+    def estimate_gaze_directions(self, rgb_frame: np.ndarray, faces: List[dict]) -> List[Tuple[float, float]]:
         """
-        Estimate gaze direction for a detected face.
+        Estimate gaze direction for every detected face with one face mesh pass.
         
         Args:
-            frame: Input image frame
-            face_bbox: Face bounding box information
+            rgb_frame: Full input image frame (RGB format)
+            faces: Face detection results from detect_faces
             
         Returns:
-            Tuple of (pitch, yaw) angles in degrees
+            List of (pitch, yaw) angles in degrees, one per face. Faces without
+            matching mesh landmarks get (0.0, 0.0).
         """
+        gaze_angles = [(0.0, 0.0)] * len(faces)
+        
         try:
-            # Extract face region
-            h, w = frame.shape[:2]
-            x = int(face_bbox['bbox'].xmin * w)
-            y = int(face_bbox['bbox'].ymin * h)
-            width = int(face_bbox['bbox'].width * w)
-            height = int(face_bbox['bbox'].height * h)
-            
-            # Ensure coordinates are within frame bounds
-            x = max(0, x)
-            y = max(0, y)
-            width = min(width, w - x)
-            height = min(height, h - y)
-            
-            face_roi = frame[y:y+height, x:x+width]
-            
-            if face_roi.size == 0:
-                return (0.0, 0.0)
-            
-            # Process with face mesh for detailed landmarks
-            rgb_face = cv2.cvtColor(face_roi, cv2.COLOR_BGR2RGB)
-            mesh_results = self.face_mesh.process(rgb_face)
+            # Face mesh runs once on the whole frame; each mesh is matched to a
+            # detected face by the face box its nose tip falls in
+            mesh_results = self.face_mesh.process(rgb_frame)
             
             if mesh_results.multi_face_landmarks:
-                landmarks = mesh_results.multi_face_landmarks[0]
+                h, w = rgb_frame.shape[:2]
                 
-                # Calculate gaze direction using eye landmarks
-                # This is a simplified approach - in production, use a proper gaze estimation model
-                left_eye_center = self._get_eye_center(landmarks, 'left')
-                right_eye_center = self._get_eye_center(landmarks, 'right')
-                nose_tip = self._get_nose_tip(landmarks)
+                pixel_scale = np.array([w, h], dtype=np.float64)
                 
-                if left_eye_center and right_eye_center and nose_tip:
-                    # Calculate head pose angles
-                    pitch, yaw = self._calculate_head_pose(
-                        left_eye_center, right_eye_center, nose_tip
+                for landmarks in mesh_results.multi_face_landmarks:
+                    points = self._landmarks_to_np(landmarks)
+                    if points is None:
+                        continue
+                    
+                    face_index = self._match_face(faces, self._get_nose_tip(points))
+                    if face_index is None:
+                        continue
+                    
+                    # Landmarks are normalized to the full frame; scale to pixels so
+                    # the angles do not depend on the frame's aspect ratio
+                    points *= pixel_scale
+                    
+                    # Calculate gaze direction using eye landmarks
+                    # This is a simplified approach - in production, use a proper gaze estimation model
+                    gaze_angles[face_index] = self._calculate_head_pose(
+                        self._get_eye_center(points, 'left'),
+                        self._get_eye_center(points, 'right'),
+                        self._get_nose_tip(points)
                     )
-                    return (pitch, yaw)
             
         except Exception as e:
             logger.error(f"Error in gaze estimation: {e}")
         
-        return (0.0, 0.0)
+        return gaze_angles
     
-    def _get_eye_center(self, landmarks, eye_type: str) -> Optional[Tuple[float, float]]:
-        """Get eye center coordinates from face mesh landmarks."""
-        # MediaPipe face mesh eye landmark indices
-        if eye_type == 'left':
-            eye_indices = [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]
-        else:  # right eye
-            eye_indices = [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]
-        
-        eye_points = []
-        for idx in eye_indices:
-            if idx < len(landmarks.landmark):
-                landmark = landmarks.landmark[idx]
-                eye_points.append((landmark.x, landmark.y))
-        
-        if eye_points:
-            return (sum(p[0] for p in eye_points) / len(eye_points),
-                   sum(p[1] for p in eye_points) / len(eye_points))
+    @staticmethod
+    def _match_face(faces: List[dict], point: Tuple[float, float]) -> Optional[int]:
+        """Return the index of the first face whose bounding box contains the normalized point."""
+        px, py = point
+        for index, face in enumerate(faces):
+            bbox = face['bbox']
+            if bbox.xmin <= px <= bbox.xmin + bbox.width and bbox.ymin <= py <= bbox.ymin + bbox.height:
+                return index
         return None
     
-    def _get_nose_tip(self, landmarks) -> Optional[Tuple[float, float]]:
-        """Get nose tip coordinates from face mesh landmarks."""
-        # Nose tip landmark index in MediaPipe face mesh
-        nose_tip_idx = 1
-        if nose_tip_idx < len(landmarks.landmark):
-            landmark = landmarks.landmark[nose_tip_idx]
-            return (landmark.x, landmark.y)
-        return None
+    @staticmethod
+    def _to_rgb(image: np.ndarray, buffer: Optional[np.ndarray]) -> np.ndarray:
+        """Convert a BGR image to RGB into buffer, allocating a new one only on shape change."""
+        if buffer is None or buffer.shape != image.shape:
+            buffer = np.empty(image.shape, dtype=image.dtype)
+        cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=buffer)
+        return buffer
+    
+    def _landmarks_to_np(self, landmarks) -> Optional[np.ndarray]:
+        """
+        Gather the gaze landmarks' (x, y) coordinates into one array.
+        
+        Only the eye and nose landmarks are read from the protobuf, in
+        GAZE_LANDMARK_IDX order. Returns None if the mesh is incomplete.
+        """
+        landmark_list = landmarks.landmark
+        if len(landmark_list) < self.GAZE_LANDMARK_COUNT:
+            return None
+        gathered = [landmark_list[idx] for idx in self.GAZE_LANDMARK_IDX]
+        points = np.fromiter(
+            (coord for landmark in gathered for coord in (landmark.x, landmark.y)),
+            dtype=np.float64,
+            count=len(self.GAZE_LANDMARK_IDX) * 2
+        )
+        return points.reshape(-1, 2)
+    
+    def _get_eye_center(self, points: np.ndarray, eye_type: str) -> np.ndarray:
+        """Get eye center coordinates from the gathered landmark array."""
+        eye_rows = self.LEFT_EYE_ROWS if eye_type == 'left' else self.RIGHT_EYE_ROWS
+        return points[eye_rows].mean(axis=0)
+    
+    def _get_nose_tip(self, points: np.ndarray) -> np.ndarray:
+        """Get nose tip coordinates from the gathered landmark array."""
+        return points[self.NOSE_TIP_ROW]
     
     def _calculate_head_pose(self, left_eye, right_eye, nose_tip) -> Tuple[float, float]:
         """
@@ -192,17 +262,16 @@ class ScreenPeekDetector:
         Returns:
             Tuple of (pitch, yaw) angles in degrees
         """
-        # Calculate eye center
-        eye_center_x = (left_eye[0] + right_eye[0]) / 2
-        eye_center_y = (left_eye[1] + right_eye[1]) / 2
+        # Offset of the nose tip from the eye center, as plain floats so the
+        # scalar math below stays in the math module instead of NumPy
+        dx = float(nose_tip[0]) - (float(left_eye[0]) + float(right_eye[0])) / 2
+        dy = float(nose_tip[1]) - (float(left_eye[1]) + float(right_eye[1])) / 2
         
         # Calculate pitch (vertical head movement)
-        pitch = np.arctan2(nose_tip[1] - eye_center_y, abs(nose_tip[0] - eye_center_x))
-        pitch_degrees = np.degrees(pitch)
+        pitch_degrees = math.degrees(math.atan2(dy, abs(dx)))
         
         # Calculate yaw (horizontal head movement)
-        yaw = np.arctan2(nose_tip[0] - eye_center_x, abs(nose_tip[1] - eye_center_y))
-        yaw_degrees = np.degrees(yaw)
+        yaw_degrees = math.degrees(math.atan2(dx, abs(dy)))
         
         return (pitch_degrees, yaw_degrees)
     
@@ -239,23 +308,29 @@ class ScreenPeekDetector:
         Returns:
             DetectionResult object with detection information
         """
-        import time
-        
         timestamp = time.time()
         
-        # Detect faces
-        faces = self.detect_faces(frame)
+        # Reuse the previous result while the camera view is unchanged
+        frame_key = self._frame_fingerprint(frame)
+        if (frame_key == self._last_frame_key
+                and timestamp - self._last_result.timestamp < self.FRAME_CACHE_MAX_AGE):
+            self.frame_cache_hits += 1
+            return replace(self._last_result, timestamp=timestamp)
+        self.frame_cache_misses += 1
+        
+        # Detect faces on the downscaled frame; results are in normalized coordinates
+        faces = self.detect_faces(self._downscale(frame))
         face_count = len(faces)
         
         is_peeking = False
         gaze_angles = []
         max_confidence = 0.0
         
-        # Process each detected face
-        for face in faces:
-            gaze = self.estimate_gaze_direction(frame, face)
-            gaze_angles.append(gaze)
-            
+        # Process each detected face; detect_faces left the RGB frame in self._rgb_buf
+        if faces:
+            gaze_angles = self.estimate_gaze_directions(self._rgb_buf, faces)
+        
+        for face, gaze in zip(faces, gaze_angles):
             if self.is_looking_at_screen(gaze):
                 is_peeking = True
                 max_confidence = max(max_confidence, face['confidence'])
@@ -263,13 +338,89 @@ class ScreenPeekDetector:
         # Calculate overall confidence
         confidence = max_confidence if is_peeking else 0.0
         
-        return DetectionResult(
+        result = DetectionResult(
             is_peeking=is_peeking,
             confidence=confidence,
             face_count=face_count,
             gaze_angles=gaze_angles,
             timestamp=timestamp
         )
+        self._last_frame_key = frame_key
+        self._last_result = result
+        return result
+    
+    def _downscale(self, frame: np.ndarray) -> np.ndarray:
+        """Shrink the frame so its longer side is at most max_input_side, keeping the aspect ratio."""
+        h, w = frame.shape[:2]
+        scale = self.max_input_side / max(h, w)
+        if scale >= 1.0:
+            return frame
+        
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        buffer_shape = (size[1], size[0]) + frame.shape[2:]
+        if self._small_buf is None or self._small_buf.shape != buffer_shape:
+            self._small_buf = np.empty(buffer_shape, dtype=frame.dtype)
+        cv2.resize(frame, size, dst=self._small_buf, interpolation=cv2.INTER_AREA)
+        return self._small_buf
+    
+    def _frame_fingerprint(self, frame: np.ndarray) -> bytes:
+        """Return a coarse, noise-tolerant fingerprint of the frame for the static-frame cache."""
+        thumbnail = cv2.resize(frame, self.FRAME_FINGERPRINT_SIZE, interpolation=cv2.INTER_AREA)
+        return (thumbnail >> self.FRAME_FINGERPRINT_SHIFT).tobytes()
+    
+    async def process_frame_async(self, frame: np.ndarray) -> DetectionResult:
+        """
+        Process a frame on the detector's worker thread without blocking the event loop.
+        
+        Args:
+            frame: Input image frame (BGR format)
+            
+        Returns:
+            DetectionResult object with detection information
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.process_frame, frame)
+    
+    def process_batch(self, frames: List[np.ndarray]) -> List[DetectionResult]:
+        """
+        Process several frames in parallel, e.g. one per monitored device.
+        
+        MediaPipe graphs are not reentrant, so each batch worker thread runs
+        its own detector built with this detector's settings.
+        
+        Args:
+            frames: Input image frames (BGR format)
+            
+        Returns:
+            DetectionResult objects in the same order as frames
+        """
+        if len(frames) <= 1:
+            return [self.process_frame(frame) for frame in frames]
+        
+        if self._batch_executor is None:
+            self._batch_executor = ThreadPoolExecutor(
+                max_workers=min(self.MAX_BATCH_WORKERS, os.cpu_count() or 1),
+                thread_name_prefix='screen-peek-batch'
+            )
+        return list(self._batch_executor.map(self._process_batch_frame, frames))
+    
+    def _process_batch_frame(self, frame: np.ndarray) -> DetectionResult:
+        """Process one batch frame with the calling worker thread's detector."""
+        worker = getattr(self._batch_local, 'detector', None)
+        if worker is None:
+            worker = ScreenPeekDetector(
+                confidence_threshold=self._graph_min_confidence,
+                gaze_threshold=self.gaze_threshold,
+                screen_region=self.screen_region,
+                max_input_side=self.max_input_side
+            )
+            self._batch_local.detector = worker
+        
+        # Settings can change at runtime through the detection config API
+        worker.confidence_threshold = self.confidence_threshold
+        worker.gaze_threshold = self.gaze_threshold
+        worker.screen_region = self.screen_region
+        return worker.process_frame(frame)
     
     def update_screen_region(self, screen_region: Tuple[int, int, int, int]):
         """Update the screen region coordinates."""
@@ -282,5 +433,27 @@ class ScreenPeekDetector:
             "confidence_threshold": self.confidence_threshold,
             "gaze_threshold": self.gaze_threshold,
             "screen_region": self.screen_region,
+            "max_input_side": self.max_input_side,
+            "frame_cache_hits": self.frame_cache_hits,
+            "frame_cache_misses": self.frame_cache_misses,
             "model_status": "active"
         }
+
+
+def get_detector(**kwargs) -> ScreenPeekDetector:
+    """
+    Return the process-wide ScreenPeekDetector, building it on first use.
+    
+    Building the MediaPipe graphs is expensive, so every caller shares one
+    instance; frames are serialized through its worker thread by
+    process_frame_async. Keyword arguments only apply to the first call.
+    
+    Returns:
+        The shared ScreenPeekDetector instance
+    """
+    global _DETECTOR
+    if _DETECTOR is None:
+        with _DETECTOR_LOCK:
+            if _DETECTOR is None:
+                _DETECTOR = ScreenPeekDetector(**kwargs)
+    return _DETECTOR
@@ -16,12 +16,14 @@ if __name__ == "__main__":
     port = int(os.getenv("API_PORT", 8000))
     reload = os.getenv("RELOAD", "True").lower() == "true"
     log_level = os.getenv("LOG_LEVEL", "info").lower()
+    ws_per_message_deflate = os.getenv("WS_PER_MESSAGE_DEFLATE", "True").lower() == "true"
     
     print(f"Starting ScreenGuard Pro API server...")
     print(f"Host: {host}")
     print(f"Port: {port}")
     print(f"Reload: {reload}")
     print(f"Log Level: {log_level}")
+    print(f"WebSocket Compression: {ws_per_message_deflate}")
     print(f"API Documentation: http://{host}:{port}/api/docs")
     
     # Run the application
@@ -31,5 +33,6 @@ if __name__ == "__main__":
         port=port,
         reload=reload,
         log_level=log_level,
+        ws_per_message_deflate=ws_per_message_deflate,
         access_log=True
     )
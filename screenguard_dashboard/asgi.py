@@ -18,3 +18,7 @@ application = ProtocolTypeRouter({
         )
     ),
 })
+
+# Load the URLconf at startup so the first request doesn't pay for it
+from screenguard_dashboard.urls import warm_url_resolver  # noqa: E402 - needs configured settings
+warm_url_resolver()
@@ -2,29 +2,33 @@
 URL configuration for ScreenGuard Dashboard project.
 """
 
+from django.apps import apps
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import get_resolver, path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
 
 urlpatterns = [
     # Admin
     path('admin/', admin.site.urls),
     
-    # API endpoints
-    path('api/', include('dashboard.urls')),
-    path('api/devices/', include('devices.urls')),
-    path('api/detections/', include('detections.urls')),
-    path('api/alerts/', include('alerts.urls')),
-    path('api/analytics/', include('analytics.urls')),
-    
-    # Authentication
-    path('api/auth/', include('rest_framework.urls')),
-    path('api/auth/jwt/', include('rest_framework_simplejwt.urls')),
-    
-    # WebSocket
-    path('ws/', include('dashboard.ws_urls')),
+    # API endpoints, nested so non-API requests are rejected by a single prefix check
+    path('api/', include([
+        path('', include('dashboard.urls')),
+        path('devices/', include('devices.urls')),
+        path('detections/', include('detections.urls')),
+        path('alerts/', include('alerts.urls')),
+        path('analytics/', include('analytics.urls')),
+        
+        # Authentication
+        path('auth/', include('rest_framework.urls')),
+        # simplejwt ships views but no URLconf
+        path('auth/jwt/create/', TokenObtainPairView.as_view(), name='jwt-create'),
+        path('auth/jwt/refresh/', TokenRefreshView.as_view(), name='jwt-refresh'),
+        path('auth/jwt/verify/', TokenVerifyView.as_view(), name='jwt-verify'),
+    ])),
     
     # Redirect root to dashboard
     path('', RedirectView.as_view(url='/dashboard/', permanent=False)),
@@ -36,8 +40,16 @@ if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     
     # Add debug toolbar
-    if 'debug_toolbar' in settings.INSTALLED_APPS:
-        import debug_toolbar
+    if apps.is_installed('debug_toolbar'):
         urlpatterns = [
-            path('__debug__/', include(debug_toolbar.urls)),
+            path('__debug__/', include('debug_toolbar.urls')),
         ] + urlpatterns
+
+# Freeze the assembled patterns; nothing should extend them after import
+urlpatterns = tuple(urlpatterns)
+
+
+def warm_url_resolver():
+    """Import and index every included URLconf now rather than on the first request."""
+    # Building the reverse lookup index makes Django populate the whole resolver tree
+    return get_resolver().reverse_dict
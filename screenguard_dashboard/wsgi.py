@@ -8,3 +8,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'screenguard_dashboard.settings')
 
 application = get_wsgi_application()
+
+# Load the URLconf at startup so the first request doesn't pay for it
+from screenguard_dashboard.urls import warm_url_resolver  # noqa: E402 - needs configured settings
+warm_url_resolver()
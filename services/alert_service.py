@@ -4,10 +4,15 @@ Handles different types of alerts and notifications for screen peeking detection
 """
 
 import asyncio
+import heapq
+import itertools
 import logging
+import os
+from collections import Counter, defaultdict, deque
+from itertools import islice
 from typing import Dict, List, Optional, Callable
 from enum import Enum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import json
 import time
 
@@ -31,9 +36,36 @@ class AlertLevel(Enum):
     HIGH = "high"
     CRITICAL = "critical"
 
-@dataclass
+# Period over which max_frequency tokens are refilled in a rate limit bucket
+RATE_LIMIT_WINDOW = 60  # seconds
+
+# Maximum number of alert events kept in memory; the oldest are evicted first
+ALERT_HISTORY_CAP = 100_000
+ALERT_HISTORY_PER_USER_CAP = 10_000
+
+# Window counted as "recent_alerts" in alert statistics
+RECENT_ALERTS_WINDOW = 3600  # seconds
+
+# Maximum number of sent alerts waiting for their callbacks to run
+ALERT_QUEUE_SIZE = 4096
+
+# Maximum number of queued alerts the dispatcher handles per wakeup
+ALERT_DISPATCH_BATCH = 64
+
+_BASE36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+def _to_base36(number: int) -> str:
+    """Encode a non-negative integer in base 36."""
+    digits = []
+    while True:
+        number, remainder = divmod(number, 36)
+        digits.append(_BASE36_DIGITS[remainder])
+        if not number:
+            return "".join(reversed(digits))
+
+@dataclass(frozen=True)
 class AlertConfig:
-    """Configuration for alert settings."""
+    """Configuration for alert settings. Use dataclasses.replace() and update_config() to change it."""
     alert_type: AlertType
     enabled: bool = True
     threshold: float = 0.7
@@ -53,6 +85,62 @@ class AlertEvent:
     confidence: float
     metadata: Dict = None
 
+@dataclass
+class AlertStats:
+    """Running alert statistics, updated as alerts are sent."""
+    total: int = 0
+    by_type: Counter = field(default_factory=Counter)
+    by_level: Counter = field(default_factory=Counter)
+    confidence_sum: float = 0.0
+    recent_timestamps: deque = field(default_factory=deque)
+    
+    def record(self, alert_event: AlertEvent):
+        """Add a sent alert to the statistics."""
+        self.total += 1
+        self.by_type[alert_event.alert_type] += 1
+        self.by_level[alert_event.level] += 1
+        self.confidence_sum += alert_event.confidence
+        self.recent_timestamps.append(alert_event.timestamp)
+        # Expire as we go so the deque stays bounded even if no one asks for a snapshot
+        self._expire_recent(alert_event.timestamp)
+    
+    def _expire_recent(self, current_time: float):
+        """Drop timestamps that have fallen out of the recent window."""
+        recent_start = current_time - RECENT_ALERTS_WINDOW
+        recent_timestamps = self.recent_timestamps
+        while recent_timestamps and recent_timestamps[0] <= recent_start:
+            recent_timestamps.popleft()
+    
+    def discard(self, other: 'AlertStats'):
+        """Remove the alerts counted in other (e.g. one user's statistics) from these totals."""
+        self.total -= other.total
+        self.by_type.subtract(other.by_type)
+        self.by_type = +self.by_type
+        self.by_level.subtract(other.by_level)
+        self.by_level = +self.by_level
+        self.confidence_sum -= other.confidence_sum
+        
+        removed = Counter(other.recent_timestamps)
+        kept = deque()
+        for timestamp in self.recent_timestamps:
+            if removed[timestamp]:
+                removed[timestamp] -= 1
+            else:
+                kept.append(timestamp)
+        self.recent_timestamps = kept
+    
+    def snapshot(self, current_time: float) -> Dict:
+        """Return the statistics as a dictionary, expiring alerts older than the recent window."""
+        self._expire_recent(current_time)
+        
+        return {
+            "total_alerts": self.total,
+            "alerts_by_type": {alert_type.value: count for alert_type, count in self.by_type.items()},
+            "alerts_by_level": {level.value: count for level, count in self.by_level.items()},
+            "average_confidence": self.confidence_sum / self.total if self.total > 0 else 0.0,
+            "recent_alerts": len(self.recent_timestamps)
+        }
+
 class AlertService:
     """
     Service for managing and sending alerts when screen peeking is detected.
@@ -64,10 +152,34 @@ class AlertService:
     def __init__(self):
         """Initialize the alert service."""
         self.alert_configs: Dict[str, AlertConfig] = {}
-        self.alert_history: List[AlertEvent] = []
+        # Per-type (enabled, threshold, cooldown, max_frequency, custom_message), unpacked by send_alert
+        self._config_values: Dict[AlertType, tuple] = {}
+        self.alert_history: deque = deque(maxlen=ALERT_HISTORY_CAP)
+        self.history_by_user: Dict[str, deque] = {}  # Per-user index into alert_history
+        self.stats_global = AlertStats()
+        self.stats_by_user: Dict[str, AlertStats] = {}
         self.alert_callbacks: Dict[AlertType, List[Callable]] = {}
-        self.rate_limits: Dict[str, List[float]] = {}  # Track alert frequency
-        self.cooldowns: Dict[str, float] = {}  # Track cooldown periods
+        # alert_callbacks split by kind when registered, so send_alert needn't inspect them
+        self.sync_callbacks: Dict[AlertType, List[Callable]] = {}
+        self.async_callbacks: Dict[AlertType, List[Callable]] = {}
+        # Rate limit state per (user_id, alert_type): [tokens, last_refill, last_sent],
+        # a token bucket plus the time of the last alert for the cooldown
+        self.rate_state: Dict[tuple, list] = {}
+        # Min-heap of (expiry, seq, key, sent_at) used to drop idle rate limit state;
+        # seq keeps heapq from ever comparing the keys themselves
+        self._rate_expiry_heap: List[tuple] = []
+        self._next_expiry_seq = itertools.count().__next__
+        # Alert IDs end in a per-instance prefix (start time and process ID, so IDs
+        # stay unique across restarts and worker processes) and a monotonic sequence
+        self._alert_id_prefix = f"{_to_base36(time.time_ns())}-{_to_base36(os.getpid())}-"
+        self._next_alert_seq = itertools.count(1).__next__
+        
+        # Callbacks run on a background dispatcher fed by a bounded queue. Both are
+        # created on the first send_alert, since the service may be built before
+        # the event loop is running.
+        self._alert_queue: Optional[asyncio.Queue] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.dropped_alerts = 0  # Alerts whose callbacks were skipped because the queue was full
         
         # Initialize default alert configurations
         self._setup_default_configs()
@@ -108,7 +220,7 @@ class AlertService:
         }
         
         for alert_type, config in default_configs.items():
-            self.alert_configs[alert_type.value] = config
+            self._store_config(alert_type, config)
             self.alert_callbacks[alert_type] = []
     
     def register_callback(self, alert_type: AlertType, callback: Callable):
@@ -123,7 +235,11 @@ class AlertService:
             self.alert_callbacks[alert_type] = []
         
         self.alert_callbacks[alert_type].append(callback)
-        logger.info(f"Registered callback for {alert_type.value} alerts")
+        if asyncio.iscoroutinefunction(callback):
+            self.async_callbacks.setdefault(alert_type, []).append(callback)
+        else:
+            self.sync_callbacks.setdefault(alert_type, []).append(callback)
+        logger.info("Registered callback for %s alerts", alert_type.value)
     
     def update_config(self, alert_type: AlertType, config: AlertConfig):
         """
@@ -133,61 +249,150 @@ class AlertService:
             alert_type: Type of alert to update
             config: New configuration
         """
+        self._store_config(alert_type, config)
+        logger.info("Updated configuration for %s alerts", alert_type.value)
+    
+    def _store_config(self, alert_type: AlertType, config: AlertConfig):
+        """Store a configuration and the value tuple read on the send path."""
         self.alert_configs[alert_type.value] = config
-        logger.info(f"Updated configuration for {alert_type.value} alerts")
+        self._config_values[alert_type] = (
+            config.enabled,
+            config.threshold,
+            config.cooldown,
+            config.max_frequency,
+            config.custom_message
+        )
     
-    def _can_send_alert(self, user_id: str, alert_type: AlertType) -> bool:
+    def _ensure_dispatcher(self) -> asyncio.Queue:
+        """Return the alert queue, starting the dispatcher task on first use or if it has died."""
+        if self._alert_queue is None:
+            self._alert_queue = asyncio.Queue(maxsize=ALERT_QUEUE_SIZE)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch_alerts())
+        return self._alert_queue
+    
+    async def _dispatch_alerts(self):
+        """Run the callbacks for queued alerts, draining up to a batch per wakeup."""
+        queue = self._alert_queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < ALERT_DISPATCH_BATCH:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            
+            try:
+                await self._run_callbacks(batch)
+            except Exception as e:
+                # Keep dispatching later alerts whatever went wrong with this batch
+                logger.error("Error dispatching alert callbacks: %s", e)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+    
+    async def _run_callbacks(self, batch: List[AlertEvent]):
+        """Execute the registered callbacks for a batch of alerts."""
+        events_by_type = defaultdict(list)
+        for alert_event in batch:
+            events_by_type[alert_event.alert_type].append(alert_event)
+        
+        # Sync callbacks run inline, async ones for the whole batch concurrently
+        coroutines = []
+        for alert_type, events in events_by_type.items():
+            for callback in self.sync_callbacks.get(alert_type, ()):
+                for alert_event in events:
+                    try:
+                        callback(alert_event)
+                    except Exception as e:
+                        logger.error("Error executing alert callback: %s", e)
+            
+            for callback in self.async_callbacks.get(alert_type, ()):
+                for alert_event in events:
+                    try:
+                        coroutines.append(callback(alert_event))
+                    except Exception as e:
+                        logger.error("Error executing alert callback: %s", e)
+        
+        if coroutines:
+            outcomes = await asyncio.gather(*coroutines, return_exceptions=True)
+            for outcome in outcomes:
+                if isinstance(outcome, Exception):
+                    logger.error("Error executing alert callback: %s", outcome)
+    
+    async def close(self):
+        """Wait for queued alerts to be dispatched, then stop the dispatcher task."""
+        if self._alert_queue is None:
+            return
+        
+        # Restart a dead dispatcher so the queue can drain
+        self._ensure_dispatcher()
+        await self._alert_queue.join()
+        self._dispatcher.cancel()
+        try:
+            await self._dispatcher
+        except asyncio.CancelledError:
+            pass
+        self._dispatcher = None
+        self._alert_queue = None
+    
+    def _reserve_slot(self, user_id: str, alert_type: AlertType, cooldown: int,
+                      max_frequency: int, current_time: float) -> bool:
         """
-        Check if an alert can be sent based on rate limits and cooldowns.
+        Check rate limits and cooldowns and, if the alert is allowed, record it against them.
         
         Args:
             user_id: ID of the user
             alert_type: Type of alert to check
+            cooldown: Configured cooldown for the alert type, in seconds
+            max_frequency: Configured maximum alerts per minute for the alert type
+            current_time: Time of the alert, as returned by time.time()
             
         Returns:
             True if alert can be sent, False otherwise
         """
-        config = self.alert_configs.get(alert_type.value)
-        if not config or not config.enabled:
-            return False
-        
-        # Check cooldown
-        cooldown_key = f"{user_id}_{alert_type.value}"
-        current_time = time.time()
-        
-        if cooldown_key in self.cooldowns:
-            if current_time - self.cooldowns[cooldown_key] < config.cooldown:
+        key = (user_id, alert_type)
+        state = self.rate_state.get(key)
+        if state is None:
+            state = self.rate_state[key] = [float(max_frequency), current_time, None]
+        else:
+            # Check cooldown
+            last_sent = state[2]
+            if last_sent is not None and current_time - last_sent < cooldown:
                 return False
+            
+            # Check rate limit: refill the bucket at max_frequency tokens per minute,
+            # up to a burst capacity of max_frequency
+            refill = (current_time - state[1]) * max_frequency / RATE_LIMIT_WINDOW
+            state[0] = min(float(max_frequency), state[0] + refill)
+            state[1] = current_time
         
-        # Check rate limit
-        rate_key = f"{user_id}_{alert_type.value}"
-        if rate_key not in self.rate_limits:
-            self.rate_limits[rate_key] = []
-        
-        # Remove old timestamps (older than 1 minute)
-        minute_ago = current_time - 60
-        self.rate_limits[rate_key] = [
-            ts for ts in self.rate_limits[rate_key] if ts > minute_ago
-        ]
-        
-        # Check if we're within rate limit
-        if len(self.rate_limits[rate_key]) >= config.max_frequency:
+        if state[0] < 1.0:
             return False
         
+        state[0] -= 1.0
+        state[2] = current_time
+        
+        # Once both the cooldown and a full bucket refill have elapsed, the state for
+        # this key is equivalent to a fresh one and can be dropped
+        expiry_heap = self._rate_expiry_heap
+        heapq.heappush(expiry_heap, (
+            current_time + max(cooldown, RATE_LIMIT_WINDOW),
+            self._next_expiry_seq(), key, current_time
+        ))
+        self._prune_rate_state(current_time)
         return True
     
-    def _update_rate_limits(self, user_id: str, alert_type: AlertType):
-        """Update rate limit tracking for an alert."""
-        rate_key = f"{user_id}_{alert_type.value}"
-        cooldown_key = f"{user_id}_{alert_type.value}"
-        
-        current_time = time.time()
-        
-        if rate_key not in self.rate_limits:
-            self.rate_limits[rate_key] = []
-        
-        self.rate_limits[rate_key].append(current_time)
-        self.cooldowns[cooldown_key] = current_time
+    def _prune_rate_state(self, current_time: float):
+        """Drop rate limit state for keys that have been idle past their expiry."""
+        expiry_heap = self._rate_expiry_heap
+        rate_state = self.rate_state
+        while expiry_heap and expiry_heap[0][0] <= current_time:
+            _, _, key, sent_at = heapq.heappop(expiry_heap)
+            # Skip entries superseded by a later alert for the same key
+            state = rate_state.get(key)
+            if state is not None and state[2] == sent_at:
+                del rate_state[key]
     
     async def send_alert(self, 
                         user_id: str, 
@@ -199,6 +404,9 @@ class AlertService:
         """
         Send an alert of the specified type.
         
+        The alert is recorded immediately; its callbacks run afterwards on the
+        background dispatcher.
+        
         Args:
             user_id: ID of the user to alert
             alert_type: Type of alert to send
@@ -210,52 +418,64 @@ class AlertService:
         Returns:
             True if alert was sent successfully, False otherwise
         """
-        config = self.alert_configs.get(alert_type.value)
-        if not config:
-            logger.warning(f"No configuration found for alert type: {alert_type.value}")
+        alert_type_value = alert_type.value
+        config_values = self._config_values.get(alert_type)
+        if not config_values:
+            logger.warning("No configuration found for alert type: %s", alert_type_value)
             return False
+        enabled, threshold, cooldown, max_frequency, custom_message = config_values
         
         # Check if alert meets threshold
-        if confidence < config.threshold:
-            logger.debug(f"Alert confidence {confidence} below threshold {config.threshold}")
+        if confidence < threshold:
+            logger.debug("Alert confidence %s below threshold %s", confidence, threshold)
             return False
         
         # Check if alert can be sent
-        if not self._can_send_alert(user_id, alert_type):
-            logger.debug(f"Alert rate limited or in cooldown for user {user_id}")
+        current_time = time.time()
+        if not enabled or not self._reserve_slot(user_id, alert_type, cooldown,
+                                                 max_frequency, current_time):
+            logger.debug("Alert rate limited or in cooldown for user %s", user_id)
             return False
         
         # Create alert event
-        alert_id = f"{user_id}_{alert_type.value}_{int(time.time() * 1000)}"
+        alert_id = f"{user_id}_{alert_type_value}_{self._alert_id_prefix}{_to_base36(self._next_alert_seq())}"
         alert_event = AlertEvent(
             alert_id=alert_id,
             user_id=user_id,
             alert_type=alert_type,
             level=level,
-            message=message or config.custom_message or f"Screen peeking detected!",
-            timestamp=time.time(),
+            message=message or custom_message or f"Screen peeking detected!",
+            timestamp=current_time,
             confidence=confidence,
             metadata=metadata or {}
         )
         
-        # Add to history
-        self.alert_history.append(alert_event)
-        
-        # Update rate limits
-        self._update_rate_limits(user_id, alert_type)
-        
-        # Execute callbacks
-        callbacks = self.alert_callbacks.get(alert_type, [])
-        for callback in callbacks:
-            try:
-                if asyncio.iscoroutinefunction(callback):
-                    await callback(alert_event)
-                else:
-                    callback(alert_event)
-            except Exception as e:
-                logger.error(f"Error executing alert callback: {e}")
+        # Hand the alert to the dispatcher for its callbacks
+        try:
+            self._ensure_dispatcher().put_nowait(alert_event)
+        except asyncio.QueueFull:
+            self.dropped_alerts += 1
+            logger.warning("Alert queue full, dropping %s alert for user %s", alert_type_value, user_id)
+            return False
         
-        logger.info(f"Alert sent: {alert_type.value} to user {user_id} (confidence: {confidence:.2f})")
+        # Add to history
+        alert_history = self.alert_history
+        if len(alert_history) == alert_history.maxlen:
+            self._forget_user_alert(alert_history[0])
+        alert_history.append(alert_event)
+        user_history = self.history_by_user.get(user_id)
+        if user_history is None:
+            user_history = self.history_by_user[user_id] = deque(maxlen=ALERT_HISTORY_PER_USER_CAP)
+        user_history.append(alert_event)
+        
+        # Update running statistics
+        self.stats_global.record(alert_event)
+        user_stats = self.stats_by_user.get(user_id)
+        if user_stats is None:
+            user_stats = self.stats_by_user[user_id] = AlertStats()
+        user_stats.record(alert_event)
+        
+        logger.info("Alert sent: %s to user %s (confidence: %.2f)", alert_type_value, user_id, confidence)
         return True
     
     async def send_multiple_alerts(self, 
@@ -282,21 +502,32 @@ class AlertService:
         results = {}
         
         # Send alerts concurrently
-        tasks = []
-        for alert_type in alert_types:
-            task = self.send_alert(user_id, alert_type, level, message, confidence, metadata)
-            tasks.append((alert_type, task))
+        outcomes = await asyncio.gather(
+            *(self.send_alert(user_id, alert_type, level, message, confidence, metadata)
+              for alert_type in alert_types),
+            return_exceptions=True
+        )
         
-        for alert_type, task in tasks:
-            try:
-                success = await task
-                results[alert_type] = success
-            except Exception as e:
-                logger.error(f"Error sending {alert_type.value} alert: {e}")
+        for alert_type, outcome in zip(alert_types, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error("Error sending %s alert: %s", alert_type.value, outcome)
                 results[alert_type] = False
+            else:
+                results[alert_type] = outcome
         
         return results
     
+    def _forget_user_alert(self, alert_event: AlertEvent):
+        """Drop an alert evicted from the global history from its user's history too."""
+        user_history = self.history_by_user.get(alert_event.user_id)
+        if user_history is None:
+            return
+        # The user's deque may already have dropped it under its own cap
+        if user_history and user_history[0] is alert_event:
+            user_history.popleft()
+        if not user_history:
+            del self.history_by_user[alert_event.user_id]
+    
     def get_alert_history(self, user_id: Optional[str] = None, 
                          limit: int = 100) -> List[AlertEvent]:
         """
@@ -310,10 +541,14 @@ class AlertService:
             List of alert events
         """
         if user_id:
-            user_alerts = [alert for alert in self.alert_history if alert.user_id == user_id]
-            return user_alerts[-limit:]
+            history = self.history_by_user.get(user_id, ())
+        else:
+            history = self.alert_history
         
-        return self.alert_history[-limit:]
+        # Walk newest to oldest and stop once limit alerts are collected
+        alerts = list(islice(reversed(history), limit))
+        alerts.reverse()
+        return alerts
     
     def get_alert_stats(self, user_id: Optional[str] = None) -> Dict:
         """
@@ -325,50 +560,14 @@ class AlertService:
         Returns:
             Dictionary with alert statistics
         """
-        alerts = self.get_alert_history(user_id)
-        
-        if not alerts:
-            return {
-                "total_alerts": 0,
-                "alerts_by_type": {},
-                "alerts_by_level": {},
-                "average_confidence": 0.0,
-                "recent_alerts": 0
-            }
-        
-        # Calculate statistics
-        total_alerts = len(alerts)
-        alerts_by_type = {}
-        alerts_by_level = {}
-        total_confidence = 0.0
-        recent_alerts = 0
-        
-        current_time = time.time()
-        one_hour_ago = current_time - 3600
-        
-        for alert in alerts:
-            # Count by type
-            alert_type = alert.alert_type.value
-            alerts_by_type[alert_type] = alerts_by_type.get(alert_type, 0) + 1
-            
-            # Count by level
-            alert_level = alert.level.value
-            alerts_by_level[alert_level] = alerts_by_level.get(alert_level, 0) + 1
-            
-            # Sum confidence
-            total_confidence += alert.confidence
-            
-            # Count recent alerts
-            if alert.timestamp > one_hour_ago:
-                recent_alerts += 1
+        if user_id:
+            stats = self.stats_by_user.get(user_id)
+            if stats is None:
+                return AlertStats().snapshot(time.time())
+        else:
+            stats = self.stats_global
         
-        return {
-            "total_alerts": total_alerts,
-            "alerts_by_type": alerts_by_type,
-            "alerts_by_level": alerts_by_level,
-            "average_confidence": total_confidence / total_alerts if total_alerts > 0 else 0.0,
-            "recent_alerts": recent_alerts
-        }
+        return stats.snapshot(time.time())
     
     def clear_history(self, user_id: Optional[str] = None):
         """
@@ -378,10 +577,20 @@ class AlertService:
             user_id: ID of the user (None for all users)
         """
         if user_id:
-            self.alert_history = [alert for alert in self.alert_history if alert.user_id != user_id]
-            logger.info(f"Cleared alert history for user {user_id}")
+            self.history_by_user.pop(user_id, None)
+            user_stats = self.stats_by_user.pop(user_id, None)
+            if user_stats is not None:
+                self.stats_global.discard(user_stats)
+            self.alert_history = deque(
+                (alert for alert in self.alert_history if alert.user_id != user_id),
+                maxlen=ALERT_HISTORY_CAP
+            )
+            logger.info("Cleared alert history for user %s", user_id)
         else:
             self.alert_history.clear()
+            self.history_by_user.clear()
+            self.stats_global = AlertStats()
+            self.stats_by_user.clear()
             logger.info("Cleared all alert history")
     
     def get_configuration(self) -> Dict:
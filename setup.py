@@ -4,27 +4,41 @@ Automated setup script for the ScreenGuard Pro application.
 """
 
 import os
+import shutil
 import sys
 import subprocess
 import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Backend and web setup run in parallel; keep each command's report together
+_print_lock = threading.Lock()
+
 def run_command(command, cwd=None):
-    """Run a command and return the result."""
+    """Run a command, given as a list of arguments, and return the result."""
+    command_line = " ".join(str(arg) for arg in command)
     try:
         result = subprocess.run(
             command, 
-            shell=True, 
             cwd=cwd, 
             capture_output=True, 
             text=True, 
             check=True
         )
-        print(f"✓ {command}")
+        with _print_lock:
+            print(f"✓ {command_line}")
         return result
     except subprocess.CalledProcessError as e:
-        print(f"✗ {command}")
-        print(f"Error: {e.stderr}")
+        with _print_lock:
+            print(f"✗ {command_line}")
+            print(f"Error: {e.stderr}")
+        return None
+    except OSError as e:
+        # Without a shell, a missing executable raises instead of failing the command
+        with _print_lock:
+            print(f"✗ {command_line}")
+            print(f"Error: {e}")
         return None
 
 def check_python_version():
@@ -37,6 +51,31 @@ def check_python_version():
     print(f"✓ Python {version.major}.{version.minor}.{version.micro}")
     return True
 
+def ensure_venv(project_dir):
+    """Create the project's virtual environment if needed and return its Python path."""
+    venv_dir = project_dir / "venv"
+    if not venv_dir.exists():
+        print("Creating virtual environment...")
+        run_command([sys.executable, "-m", "venv", "venv"], cwd=project_dir)
+    
+    # Use the virtual environment's interpreter directly; the path is made absolute
+    # because commands run with cwd set to the project directory
+    bin_dir = "Scripts" if platform.system() == "Windows" else "bin"
+    return str(venv_dir.resolve() / bin_dir / "python")
+
+def install_requirements(project_dir, python_cmd):
+    """Install requirements.txt into the virtual environment, upgrading pip on first use."""
+    command = [python_cmd, "-m", "pip", "install"]
+    
+    # pip only needs upgrading once per virtual environment
+    pip_marker = project_dir / "venv" / ".pip_upgraded"
+    if not pip_marker.exists():
+        command += ["--upgrade", "pip"]
+    command += ["-r", "requirements.txt"]
+    
+    if run_command(command, cwd=project_dir) is not None:
+        pip_marker.touch()
+
 def setup_backend():
     """Setup the FastAPI backend."""
     print("\n🔧 Setting up Backend...")
@@ -46,33 +85,17 @@ def setup_backend():
         print("❌ Backend directory not found")
         return False
     
-    # Create virtual environment
-    venv_dir = backend_dir / "venv"
-    if not venv_dir.exists():
-        print("Creating virtual environment...")
-        if platform.system() == "Windows":
-            run_command("python -m venv venv", cwd=backend_dir)
-        else:
-            run_command("python3 -m venv venv", cwd=backend_dir)
-    
-    # Activate virtual environment and install dependencies
-    if platform.system() == "Windows":
-        pip_cmd = str(venv_dir / "Scripts" / "pip")
-        python_cmd = str(venv_dir / "Scripts" / "python")
-    else:
-        pip_cmd = str(venv_dir / "bin" / "pip")
-        python_cmd = str(venv_dir / "bin" / "python")
+    python_cmd = ensure_venv(backend_dir)
     
     print("Installing backend dependencies...")
-    run_command(f"{pip_cmd} install --upgrade pip", cwd=backend_dir)
-    run_command(f"{pip_cmd} install -r requirements.txt", cwd=backend_dir)
+    install_requirements(backend_dir, python_cmd)
     
     # Create .env file if it doesn't exist
     env_file = backend_dir / ".env"
     env_example = backend_dir / "env.example"
     if not env_file.exists() and env_example.exists():
         print("Creating .env file...")
-        run_command(f"copy env.example .env", cwd=backend_dir)
+        shutil.copyfile(env_example, env_file)
     
     print("✓ Backend setup complete")
     return True
@@ -86,38 +109,22 @@ def setup_web():
         print("❌ Web directory not found")
         return False
     
-    # Create virtual environment
-    venv_dir = web_dir / "venv"
-    if not venv_dir.exists():
-        print("Creating virtual environment...")
-        if platform.system() == "Windows":
-            run_command("python -m venv venv", cwd=web_dir)
-        else:
-            run_command("python3 -m venv venv", cwd=web_dir)
-    
-    # Activate virtual environment and install dependencies
-    if platform.system() == "Windows":
-        pip_cmd = str(venv_dir / "Scripts" / "pip")
-        python_cmd = str(venv_dir / "Scripts" / "python")
-    else:
-        pip_cmd = str(venv_dir / "bin" / "pip")
-        python_cmd = str(venv_dir / "bin" / "python")
+    python_cmd = ensure_venv(web_dir)
     
     print("Installing web dependencies...")
-    run_command(f"{pip_cmd} install --upgrade pip", cwd=web_dir)
-    run_command(f"{pip_cmd} install -r requirements.txt", cwd=web_dir)
+    install_requirements(web_dir, python_cmd)
     
     # Create .env file if it doesn't exist
     env_file = web_dir / ".env"
     env_example = web_dir / "env.example"
     if not env_file.exists() and env_example.exists():
         print("Creating .env file...")
-        run_command(f"copy env.example .env", cwd=web_dir)
+        shutil.copyfile(env_example, env_file)
     
     # Run Django migrations
     print("Running Django migrations...")
-    run_command(f"{python_cmd} manage.py makemigrations", cwd=web_dir)
-    run_command(f"{python_cmd} manage.py migrate", cwd=web_dir)
+    run_command([python_cmd, "manage.py", "makemigrations"], cwd=web_dir)
+    run_command([python_cmd, "manage.py", "migrate"], cwd=web_dir)
     
     # Create superuser (optional)
     print("Creating superuser...")
@@ -186,15 +193,19 @@ def main():
     if not check_python_version():
         sys.exit(1)
     
-    # Setup backend
-    if not setup_backend():
-        print("❌ Backend setup failed")
-        sys.exit(1)
-    
-    # Setup web dashboard
-    if not setup_web():
-        print("❌ Web dashboard setup failed")
-        sys.exit(1)
+    # Setup backend and web dashboard; they use separate directories and
+    # virtual environments, so their pip installs can run side by side
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        backend_future = executor.submit(setup_backend)
+        web_future = executor.submit(setup_web)
+        
+        if not backend_future.result():
+            print("❌ Backend setup failed")
+            sys.exit(1)
+        
+        if not web_future.result():
+            print("❌ Web dashboard setup failed")
+            sys.exit(1)
     
     # Create startup scripts
     create_startup_scripts()